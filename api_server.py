@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+API Server - Server HTTP/JSON locale per TimeMindAgent
+
+Un unico TimeMindAgent (modelli, knowledge base, pool di connessioni e
+cache) è condiviso da tutte le richieste; ogni connessione è servita da un
+thread. L'utente si indica con l'header X-TimeMind-User (o ?user=) e
+seleziona la vista TimeMindAgent.for_user; senza utente la richiesta è
+servita come utente di default (DEFAULT_USER_ID), mai senza filtri. La chat può rispondere in streaming come server-sent events.
+
+Sicurezza: il server non ha autenticazione. L'header X-TimeMind-User separa
+i dati tra utenti ma non li protegge: qualsiasi client può indicare
+qualsiasi utente. Va esposto solo su loopback (default 127.0.0.1) o dietro
+un proxy fidato che autentica le richieste e imposta l'header.
+
+Uso:
+    python api_server.py --port 8765
+    python api_server.py --fake    # agenti finti, per prove e load test
+"""
+
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from rag_system import FILTER_FIELDS
+from database_manager import DEFAULT_USER_ID
+
+# Identificativi utente accettati
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+# Indirizzi raggiungibili solo dalla macchina locale
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Dimensione massima del corpo JSON di una richiesta
+MAX_BODY_BYTES = 1024 * 1024
+
+class TimeMindRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive: i client possono riusare la connessione tra le richieste
+    protocol_version = "HTTP/1.1"
+    server_version = "TimeMind/1.0"
+
+    # (metodo, percorso, handler): i gruppi del percorso sono passati all'handler
+    ROUTES = [
+        ("GET", r"/health", "health"),
+        ("GET", r"/tasks", "list_tasks"),
+        ("POST", r"/tasks", "add_task"),
+        ("POST", r"/tasks/(\d+)/complete", "complete_task"),
+        ("DELETE", r"/tasks/(\d+)", "delete_task"),
+        ("GET", r"/habits", "list_habits"),
+        ("POST", r"/habits", "add_habit"),
+        ("POST", r"/habits/(\d+)/log", "log_habit"),
+        ("GET", r"/habits/stats", "habit_stats"),
+        ("GET", r"/pomodoros", "pomodoro_status"),
+        ("POST", r"/pomodoros", "start_pomodoro"),
+        ("GET", r"/pomodoros/stats", "pomodoro_stats"),
+        ("DELETE", r"/pomodoros/(\d+)", "stop_pomodoro"),
+        ("GET", r"/summary", "summary"),
+        ("GET", r"/report", "report"),
+        ("GET", r"/search", "search"),
+        ("GET", r"/outbox", "outbox_status"),
+        ("POST", r"/knowledge", "add_knowledge"),
+        ("POST", r"/chat", "chat"),
+    ]
+    ROUTES = [(method, re.compile(pattern + "$"), name) for method, pattern, name in ROUTES]
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    # === INFRASTRUTTURA ===
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        allowed = False
+        for route_method, pattern, name in self.ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+
+            try:
+                self.body = self._read_body()
+                self.agent = self._agent()
+                status, payload = getattr(self, f"handle_{name}")(*match.groups())
+            except ValueError as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": f"Errore interno: {e}"}
+
+            if payload is not None:
+                self._send_json(status, payload)
+            return
+
+        # Il corpo non è stato letto: la connessione non è riutilizzabile
+        self.close_connection = True
+        if allowed:
+            self._send_json(405, {"error": f"Metodo {method} non consentito per {url.path}"})
+        else:
+            self._send_json(404, {"error": f"Endpoint non trovato: {url.path}"})
+
+    def _agent(self):
+        """Agente dell'utente della richiesta (utente di default se non indicato)"""
+        user_id = self.headers.get("X-TimeMind-User") or self.query.get("user") or DEFAULT_USER_ID
+        if not USER_ID_PATTERN.match(user_id):
+            raise ValueError(f"Utente non valido: {user_id}")
+        return self.server.agent.for_user(user_id)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            # Il corpo non viene letto: la connessione non è riutilizzabile
+            self.close_connection = True
+            raise ValueError("Corpo della richiesta troppo grande")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON non valido: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("Il corpo deve essere un oggetto JSON")
+        return body
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _field(self, name, cast=str, default=None, required=False):
+        """Campo del corpo JSON (o della query string) convertito al tipo atteso"""
+        value = self.body.get(name, self.query.get(name))
+        if value is None or value == "":
+            if required:
+                raise ValueError(f"Campo obbligatorio mancante: {name}")
+            return default
+        if cast is bool and isinstance(value, str):
+            return value.lower() not in ("0", "false", "no")
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Valore non valido per {name}: {value}")
+
+    @staticmethod
+    def _message(message, status=200):
+        """Risposta con il messaggio testuale dell'agente"""
+        return status, {"ok": not message.startswith("❌"), "message": message}
+
+    # === ENDPOINT ===
+
+    def handle_health(self):
+        return 200, {"status": "ok", "user": self.agent.user_id}
+
+    def handle_list_tasks(self):
+        status = self._field("status", default="pending")
+        return 200, {"tasks": self.agent.list_tasks(status)}
+
+    def handle_add_task(self):
+        return self._message(self.agent.add_task(
+            self._field("title", required=True),
+            self._field("description", default=""),
+            self._field("priority", int, 2),
+            self._field("estimated_minutes", int, 30)
+        ), 201)
+
+    def handle_complete_task(self, task_id):
+        return self._message(self.agent.complete_task(int(task_id), self._field("actual_minutes", int)))
+
+    def handle_delete_task(self, task_id):
+        return self._message(self.agent.delete_task(int(task_id)))
+
+    def handle_list_habits(self):
+        active_only = not self._field("all", bool, False)
+        return 200, {"habits": self.agent.list_habits(active_only)}
+
+    def handle_add_habit(self):
+        return self._message(self.agent.add_habit(
+            self._field("name", required=True),
+            self._field("description", default=""),
+            self._field("frequency", default="daily")
+        ), 201)
+
+    def handle_log_habit(self, habit_id):
+        return self._message(self.agent.log_habit(
+            int(habit_id), self._field("completed", bool, True), self._field("notes", default="")
+        ))
+
+    def handle_habit_stats(self):
+        return 200, {"habits": self.agent.habit_analytics.compute()['habits']}
+
+    def handle_pomodoro_status(self):
+        return self._message(self.agent.get_pomodoro_status())
+
+    def handle_start_pomodoro(self):
+        return self._message(self.agent.start_pomodoro(
+            self._field("task_id", int), self._field("cycles", int, 1)
+        ), 201)
+
+    def handle_pomodoro_stats(self):
+        return self._message(self.agent.get_pomodoro_stats())
+
+    def handle_stop_pomodoro(self, timer_id):
+        return self._message(self.agent.stop_pomodoro(int(timer_id)))
+
+    def handle_summary(self):
+        return self._message(self.agent.get_daily_summary())
+
+    def handle_report(self):
+        return 200, self.agent.task_analytics.compute(self._field("days", int, 30))
+
+    def handle_search(self):
+        query = self._field("q", required=True)
+        where = {key: self.query[key] for key in FILTER_FIELDS if self.query.get(key)}
+        results = self.agent.rag_system.search_documents(
+            query, self._field("n", int, 2), where or None, user_id=self.agent.user_id,
+            date_from=self._field("date_from"), date_to=self._field("date_to")
+        )
+        return 200, {"results": results or {"documents": [], "distances": [], "metadatas": []}}
+
+    def handle_outbox_status(self):
+        return self._message(self.agent.get_outbox_status())
+
+    def handle_add_knowledge(self):
+        message = self.agent.add_knowledge(self._field("text", required=True), self._field("doc_id", required=True))
+        # 202: documento in coda nell'outbox, indicizzato più tardi
+        return self._message(message, 202 if message.startswith("⏳") else 201)
+
+    def handle_chat(self):
+        message = self._field("message", required=True)
+        remote = self._field("remote", bool, False)
+        stream = self._field("stream", bool, "text/event-stream" in self.headers.get("Accept", ""))
+
+        if not stream:
+            return 200, {"response": self.agent.chat(message, use_remote=remote)}
+
+        # Server-sent events: un evento per frammento, poi 'done'
+        chunks = self.agent.chat_stream(message, use_remote=remote)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            for chunk in chunks:
+                self._send_event({"text": chunk})
+            self._send_event({}, "done")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client disconnesso: interrompe la generazione
+            chunks.close()
+        return 200, None
+
+    def _send_event(self, payload, event=None):
+        data = f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        if event:
+            data = f"event: {event}\n" + data
+        self.wfile.write(data.encode("utf-8"))
+        self.wfile.flush()
+
+class TimeMindAPIServer(ThreadingHTTPServer):
+    # I thread delle connessioni non bloccano l'arresto del processo
+    daemon_threads = True
+    # Coda di connessioni in attesa (il default 5 rifiuta i picchi di client)
+    request_queue_size = 128
+
+    def __init__(self, agent, host="127.0.0.1", port=8765, quiet=False):
+        super().__init__((host, port), TimeMindRequestHandler)
+        self.agent = agent
+        self.quiet = quiet
+
+def main():
+    parser = argparse.ArgumentParser(description="Server HTTP/JSON locale per TimeMind")
+    parser.add_argument("--host", default="127.0.0.1", help="Indirizzo di ascolto (solo loopback: nessuna autenticazione)")
+    parser.add_argument("--port", type=int, default=8765, help="Porta di ascolto")
+    parser.add_argument("--db", default="./timemind.db", help="Database SQLite")
+    parser.add_argument("--fake", action="store_true", help="Usa agenti finti (nessun modello né rete)")
+    parser.add_argument("--quiet", action="store_true", help="Non registra le singole richieste")
+    args = parser.parse_args()
+
+    from timemind_main import TimeMindAgent
+    if args.fake:
+        from fake_agents import FakeLocalAgent, FakeRemoteAgent
+        agent = TimeMindAgent(FakeLocalAgent(), FakeRemoteAgent(), db_path=args.db)
+    else:
+        agent = TimeMindAgent(db_path=args.db)
+
+    if args.host not in LOOPBACK_HOSTS:
+        print(f"⚠️ In ascolto su {args.host} senza autenticazione: chiunque raggiunga la porta "
+              f"può leggere e modificare i dati di qualsiasi utente")
+    server = TimeMindAPIServer(agent, args.host, args.port, args.quiet)
+    print(f"🌐 TimeMind API in ascolto su http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Arresto server")
+    finally:
+        server.server_close()
+        agent.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Circuit Breaker - Protezione dalle chiamate ripetute a un servizio non raggiungibile
+
+Dopo failure_threshold errori consecutivi il circuito si apre e le chiamate
+vengono rifiutate subito, senza attendere i timeout di rete. Trascorso
+reset_timeout una sola chiamata di prova (half-open) verifica se il servizio
+è tornato: se riesce il circuito si richiude, altrimenti resta aperto.
+"""
+
+import threading
+import time
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.failures = 0
+        self.last_error = None
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True se la chiamata può partire (a circuito aperto solo la prova)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Chiamata di prova: le altre restano bloccate fino al suo esito
+            self.state = "half_open"
+            self._opened_at = time.monotonic()
+            return True
+
+    def retry_after(self):
+        """Secondi prima della prossima chiamata consentita (0 se chiuso)"""
+        with self._lock:
+            if self.state == "closed":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.last_error = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        """True se le chiamate vengono rifiutate"""
+        return self.retry_after() > 0
+
+    def status(self):
+        """Descrizione breve dello stato del circuito"""
+        if self.state == "closed":
+            return "disponibile"
+        wait = int(self.retry_after())
+        result = f"non disponibile ({self.failures} errori, nuovo tentativo tra {wait}s)"
+        if self.last_error:
+            result += f" - {self.last_error}"
+        return result
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Connection Pool - Pool di connessioni SQLite condiviso tra thread e utenti
+
+Le connessioni restituite da connect() si usano come normali connessioni
+sqlite3: close() le rimette nel pool invece di chiuderle. Usate con 'with'
+tornano al pool anche in caso di eccezione (le transazioni non confermate
+vengono annullate).
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+
+class PooledConnection:
+    """Connessione del pool: close() la restituisce al pool"""
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, '_conn', None)
+            self._pool._release(conn)
+
+class ConnectionPool:
+    def __init__(self, db_path, max_size=8, timeout=30.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        # WAL: letture concorrenti durante le scritture
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def connect(self):
+        """Prende una connessione libera, creandola se il pool non è pieno"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.max_size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Nessuna connessione disponibile per {self.db_path}")
+        return PooledConnection(self, conn)
+
+    def _release(self, conn):
+        # Annulla eventuali transazioni lasciate aperte e ripristina lo stato
+        conn.rollback()
+        conn.row_factory = None
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Chiude le connessioni inattive"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_path, max_size=8):
+    """Pool condiviso per un file di database
+
+    I percorsi relativi sono risolti subito: lo stesso nome in directory
+    diverse indica file diversi, e un chdir successivo non cambia file.
+    """
+    if db_path != ":memory:":
+        db_path = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path, max_size)
+        return pool
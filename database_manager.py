@@ -3,206 +3,311 @@
 Database Manager - Gestione del database SQLite per TimeMind
 """
 
+import copy
 import sqlite3
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from connection_pool import get_pool
+
+# Utente usato in modalità singolo utente e per i dati precedenti al multi-tenant
+DEFAULT_USER_ID = "default"
+
+# Tabelle con colonna user_id
+TENANT_TABLES = ("tasks", "habits", "habit_logs", "daily_reflections", "pomodoro_sessions", "pomodoro_timers")
+
+# Viste per utente tenute in memoria: oltre il limite si scartano le meno usate
+MAX_TENANT_VIEWS = 256
 
 class DatabaseManager:
-    def __init__(self, db_path="./timemind.db"):
+    def __init__(self, db_path="./timemind.db", user_id=DEFAULT_USER_ID, pool=None):
         self.db_path = db_path
-        self.init_database()
-        
-    def init_database(self):
-        """Inizializza il database SQLite locale"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.user_id = user_id
         
-        # Tabella task/todo
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority INTEGER DEFAULT 2,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                estimated_minutes INTEGER,
-                actual_minutes INTEGER
-            )
-        """)
+        # Pool di connessioni condiviso da tutti gli utenti dello stesso database
+        self.pool = pool or get_pool(db_path)
         
-        # Tabella abitudini
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS habits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                description TEXT,
-                target_frequency TEXT DEFAULT 'daily',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                active BOOLEAN DEFAULT 1
-            )
-        """)
+        # Viste per utente create da for_user, in ordine di utilizzo (condivise
+        # tra le viste); la vista iniziale non viene mai scartata
+        self._tenants = OrderedDict({user_id: self})
+        self._root_user_id = user_id
+        self._tenants_lock = threading.Lock()
         
-        # Tabella tracciamento abitudini
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS habit_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                habit_id INTEGER,
-                date DATE,
-                completed BOOLEAN,
-                notes TEXT,
-                FOREIGN KEY (habit_id) REFERENCES habits (id)
-            )
-        """)
+        # Incrementato a ogni modifica di abitudini/log: invalida le cache delle analytics
+        self.habit_version = 0
+        self._habit_version_lock = threading.Lock()
         
-        # Tabella riflessioni giornaliere
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS daily_reflections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date DATE UNIQUE,
-                morning_plan TEXT,
-                evening_reflection TEXT,
-                mood_score INTEGER,
-                productivity_score INTEGER,
-                lessons_learned TEXT,
-                tomorrow_focus TEXT
-            )
-        """)
-        
-        # Tabella sessioni Pomodoro
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pomodoro_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_id INTEGER,
-                start_time TIMESTAMP,
-                end_time TIMESTAMP,
-                duration_minutes INTEGER,
-                completed BOOLEAN,
-                notes TEXT,
-                FOREIGN KEY (task_id) REFERENCES tasks (id)
-            )
-        """)
+        # Idempotente: ogni istanza verifica lo schema del proprio file
+        self.init_database()
+    
+    def for_user(self, user_id: str):
+        """Vista del database limitata a un utente, con pool condiviso"""
+        with self._tenants_lock:
+            manager = self._tenants.get(user_id)
+            if manager is not None:
+                self._tenants.move_to_end(user_id)
+                return manager
+            
+            manager = copy.copy(self)
+            manager.user_id = user_id
+            manager.habit_version = 0
+            manager._habit_version_lock = threading.Lock()
+            self._tenants[user_id] = manager
+            
+            if len(self._tenants) > MAX_TENANT_VIEWS:
+                oldest = next(key for key in self._tenants if key != self._root_user_id)
+                del self._tenants[oldest]
+            return manager
+    
+    def _habits_changed(self):
+        """Invalida le cache delle analytics (le richieste API arrivano da più thread)"""
+        with self._habit_version_lock:
+            self.habit_version += 1
+    
+    def _connect(self):
+        """Connessione dal pool, da usare con 'with' (all'uscita torna al pool)"""
+        return self.pool.connect()
         
-        conn.commit()
-        conn.close()
+    def init_database(self):
+        """Inizializza il database SQLite locale"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            # Tabella task/todo
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    title TEXT NOT NULL,
+                    description TEXT,
+                    priority INTEGER DEFAULT 2,
+                    status TEXT DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP,
+                    estimated_minutes INTEGER,
+                    actual_minutes INTEGER
+                )
+            """)
+            
+            # Tabella abitudini
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS habits (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    target_frequency TEXT DEFAULT 'daily',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    active BOOLEAN DEFAULT 1
+                )
+            """)
+            
+            # Tabella tracciamento abitudini
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS habit_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    habit_id INTEGER,
+                    date DATE,
+                    completed BOOLEAN,
+                    notes TEXT,
+                    FOREIGN KEY (habit_id) REFERENCES habits (id)
+                )
+            """)
+            
+            # Tabella riflessioni giornaliere
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS daily_reflections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    date DATE,
+                    morning_plan TEXT,
+                    evening_reflection TEXT,
+                    mood_score INTEGER,
+                    productivity_score INTEGER,
+                    lessons_learned TEXT,
+                    tomorrow_focus TEXT,
+                    UNIQUE (user_id, date)
+                )
+            """)
+            
+            # Tabella sessioni Pomodoro
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pomodoro_sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    task_id INTEGER,
+                    start_time TIMESTAMP,
+                    end_time TIMESTAMP,
+                    duration_minutes INTEGER,
+                    completed BOOLEAN,
+                    notes TEXT,
+                    FOREIGN KEY (task_id) REFERENCES tasks (id)
+                )
+            """)
+            
+            # Tabella timer Pomodoro (stato dello scheduler, sopravvive ai riavvii)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pomodoro_timers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL DEFAULT 'default',
+                    task_id INTEGER,
+                    session_id INTEGER,
+                    phase TEXT DEFAULT 'focus',
+                    current_cycle INTEGER DEFAULT 1,
+                    total_cycles INTEGER DEFAULT 1,
+                    phase_ends_at TIMESTAMP,
+                    FOREIGN KEY (task_id) REFERENCES tasks (id),
+                    FOREIGN KEY (session_id) REFERENCES pomodoro_sessions (id)
+                )
+            """)
+            
+            # Database creati prima del multi-tenant: i dati esistenti vanno all'utente di default
+            for table in TENANT_TABLES:
+                columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+                if "user_id" not in columns:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default'")
+            
+            # Indici per le query filtrate per utente
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_status ON tasks (user_id, status, priority)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_habits_user_active ON habits (user_id, active)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_date ON habit_logs (habit_id, date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_habit_logs_user_date ON habit_logs (user_id, date)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pomodoro_sessions_user_start ON pomodoro_sessions (user_id, start_time)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_pomodoro_timers_phase ON pomodoro_timers (phase, user_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_daily_reflections_user_date ON daily_reflections (user_id, date)")
+            
+            conn.commit()
         
     # === TASK MANAGEMENT ===
     
     def add_task(self, title: str, description: str = "", priority: int = 2, estimated_minutes: int = 30) -> str:
         """Aggiunge un nuovo task alla lista"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO tasks (title, description, priority, estimated_minutes) 
-            VALUES (?, ?, ?, ?)
-        """, (title, description, priority, estimated_minutes))
-        
-        task_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO tasks (user_id, title, description, priority, estimated_minutes) 
+                VALUES (?, ?, ?, ?, ?)
+            """, (self.user_id, title, description, priority, estimated_minutes))
+            
+            task_id = cursor.lastrowid
+            conn.commit()
         
         return f"✅ Task aggiunto: '{title}' (ID: {task_id}, Priorità: {priority}, Stima: {estimated_minutes}min)"
     
+    def list_tasks(self, status: str = "pending") -> list:
+        """Task con status specificato come dizionari (usato dall'API)"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, title, description, priority, status, estimated_minutes, actual_minutes,
+                       created_at, completed_at
+                FROM tasks WHERE user_id = ? AND status = ? ORDER BY priority DESC, created_at ASC
+            """, (self.user_id, status))
+            
+            tasks = [dict(row) for row in cursor.fetchall()]
+        return tasks
+    
     def get_tasks(self, status: str = "pending") -> str:
         """Recupera i task con status specificato"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, priority, estimated_minutes, created_at
-            FROM tasks WHERE status = ? ORDER BY priority DESC, created_at ASC
-        """, (status,))
-        
-        tasks = cursor.fetchall()
-        conn.close()
+        tasks = self.list_tasks(status)
         
         if not tasks:
             return f"📝 Nessun task con status '{status}'"
         
         result = f"📋 Task ({status}):\n"
         for task in tasks:
-            result += f"• ID {task[0]}: {task[1]} (P{task[2]}, ~{task[4]}min)\n"
+            result += f"• ID {task['id']}: {task['title']} (P{task['priority']}, ~{task['estimated_minutes']}min)\n"
         
         return result
     
     def complete_task(self, task_id: int, actual_minutes: int = None) -> str:
         """Completa un task"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE tasks SET status = 'completed', completed_at = CURRENT_TIMESTAMP, actual_minutes = ?
-            WHERE id = ?
-        """, (actual_minutes, task_id))
-        
-        if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
-            return f"✅ Task {task_id} completato! Tempo effettivo: {actual_minutes}min"
-        else:
-            conn.close()
-            return f"❌ Task {task_id} non trovato"
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            # Senza tempo esplicito mantiene i minuti accumulati dai Pomodoro
+            cursor.execute("""
+                UPDATE tasks SET status = 'completed', completed_at = CURRENT_TIMESTAMP,
+                    actual_minutes = COALESCE(?, actual_minutes)
+                WHERE id = ? AND user_id = ?
+            """, (actual_minutes, task_id, self.user_id))
+            
+            if cursor.rowcount > 0:
+                cursor.execute("SELECT actual_minutes FROM tasks WHERE id = ? AND user_id = ?", (task_id, self.user_id))
+                actual_minutes = cursor.fetchone()[0]
+                conn.commit()
+                return f"✅ Task {task_id} completato! Tempo effettivo: {actual_minutes}min"
+            else:
+                return f"❌ Task {task_id} non trovato"
+    
+    def has_task(self, task_id: int) -> bool:
+        """True se il task esiste e appartiene all'utente"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM tasks WHERE id = ? AND user_id = ?", (task_id, self.user_id))
+            found = cursor.fetchone() is not None
+        return found
     
     def delete_task(self, task_id: int) -> str:
         """Elimina un task"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        
-        if cursor.rowcount > 0:
-            conn.commit()
-            conn.close()
-            return f"✅ Task {task_id} eliminato"
-        else:
-            conn.close()
-            return f"❌ Task {task_id} non trovato"
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("DELETE FROM tasks WHERE id = ? AND user_id = ?", (task_id, self.user_id))
+            
+            if cursor.rowcount > 0:
+                conn.commit()
+                return f"✅ Task {task_id} eliminato"
+            else:
+                return f"❌ Task {task_id} non trovato"
     
     # === HABIT MANAGEMENT ===
     
     def add_habit(self, name: str, description: str = "", frequency: str = "daily") -> str:
         """Aggiunge una nuova abitudine da tracciare"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO habits (name, description, target_frequency) 
-            VALUES (?, ?, ?)
-        """, (name, description, frequency))
-        
-        habit_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO habits (user_id, name, description, target_frequency) 
+                VALUES (?, ?, ?, ?)
+            """, (self.user_id, name, description, frequency))
+            
+            habit_id = cursor.lastrowid
+            conn.commit()
+        self._habits_changed()
         
         return f"🏃‍♂️ Abitudine aggiunta: '{name}' (ID: {habit_id}, Frequenza: {frequency})"
     
+    def list_habits(self, active_only: bool = True) -> list:
+        """Abitudini come dizionari (usato dall'API)"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, name, description, target_frequency, active, created_at
+                FROM habits WHERE user_id = ? AND (active = 1 OR NOT ?) ORDER BY created_at ASC
+            """, (self.user_id, active_only))
+            
+            habits = [dict(row) for row in cursor.fetchall()]
+        return habits
+    
     def get_habits(self, active_only: bool = True) -> str:
         """Recupera le abitudini"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if active_only:
-            cursor.execute("""
-                SELECT id, name, description, target_frequency 
-                FROM habits WHERE active = 1 ORDER BY created_at ASC
-            """)
-        else:
-            cursor.execute("""
-                SELECT id, name, description, target_frequency, active 
-                FROM habits ORDER BY created_at ASC
-            """)
-        
-        habits = cursor.fetchall()
-        conn.close()
+        habits = self.list_habits(active_only)
         
         if not habits:
             return "🏃‍♂️ Nessuna abitudine configurata"
         
         result = "🏃‍♂️ Abitudini:\n"
         for habit in habits:
-            status = "" if active_only else f" ({'Attiva' if habit[4] else 'Disattiva'})"
-            result += f"• ID {habit[0]}: {habit[1]} ({habit[3]}){status}\n"
+            status = "" if active_only else f" ({'Attiva' if habit['active'] else 'Disattiva'})"
+            result += f"• ID {habit['id']}: {habit['name']} ({habit['target_frequency']}){status}\n"
         
         return result
     
@@ -210,73 +315,227 @@ class DatabaseManager:
         """Registra il completamento di un'abitudine per oggi"""
         today = datetime.now().date()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Controlla se già registrato oggi
-        cursor.execute("""
-            SELECT id FROM habit_logs WHERE habit_id = ? AND date = ?
-        """, (habit_id, today))
-        
-        if cursor.fetchone():
-            # Aggiorna esistente
-            cursor.execute("""
-                UPDATE habit_logs SET completed = ?, notes = ?
-                WHERE habit_id = ? AND date = ?
-            """, (completed, notes, habit_id, today))
-        else:
-            # Crea nuovo
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            # L'abitudine deve appartenere all'utente
+            cursor.execute("SELECT 1 FROM habits WHERE id = ? AND user_id = ?", (habit_id, self.user_id))
+            if not cursor.fetchone():
+                return f"❌ Abitudine {habit_id} non trovata"
+            
+            # Controlla se già registrato oggi
             cursor.execute("""
-                INSERT INTO habit_logs (habit_id, date, completed, notes)
-                VALUES (?, ?, ?, ?)
-            """, (habit_id, today, completed, notes))
-        
-        conn.commit()
-        conn.close()
+                SELECT id FROM habit_logs WHERE habit_id = ? AND date = ?
+            """, (habit_id, today))
+            
+            if cursor.fetchone():
+                # Aggiorna esistente
+                cursor.execute("""
+                    UPDATE habit_logs SET completed = ?, notes = ?
+                    WHERE habit_id = ? AND date = ?
+                """, (completed, notes, habit_id, today))
+            else:
+                # Crea nuovo
+                cursor.execute("""
+                    INSERT INTO habit_logs (user_id, habit_id, date, completed, notes)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (self.user_id, habit_id, today, completed, notes))
+            
+            conn.commit()
+        self._habits_changed()
         
         status = "✅ Completata" if completed else "❌ Non completata"
         return f"{status} abitudine {habit_id} per oggi"
     
+    def load_habit_data(self) -> tuple:
+        """Abitudini attive e giorni completati, letti con due sole query
+        
+        Le date sono restituite come giorni dall'epoch Unix (interi):
+        ([(id, nome, giorno_creazione)], [(habit_id, giorno)]).
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, name, CAST(julianday(DATE(created_at)) - 2440587.5 AS INTEGER)
+                FROM habits WHERE user_id = ? AND active = 1 ORDER BY created_at ASC
+            """, (self.user_id,))
+            habits = cursor.fetchall()
+            
+            cursor.execute("""
+                SELECT habit_id, CAST(julianday(date) - 2440587.5 AS INTEGER)
+                FROM habit_logs WHERE user_id = ? AND completed = 1
+            """, (self.user_id,))
+            logs = cursor.fetchall()
+        
+        return habits, logs
+    
+    # === ANALYTICS DATA ===
+    
+    def load_task_data(self) -> tuple:
+        """Colonne di task e sessioni Pomodoro per le analisi vettoriali
+        
+        I timestamp sono in secondi Unix (NULL se assenti):
+        ([(id, priority, status, created, completed, estimated, actual)],
+         [(task_id, completed, focused_minutes)]).
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, priority, status,
+                       CAST(strftime('%s', created_at) AS INTEGER),
+                       CAST(strftime('%s', completed_at) AS INTEGER),
+                       estimated_minutes, actual_minutes
+                FROM tasks WHERE user_id = ?
+            """, (self.user_id,))
+            tasks = cursor.fetchall()
+            
+            cursor.execute("""
+                SELECT task_id, completed,
+                       CASE WHEN completed = 1
+                            THEN MIN(duration_minutes, MAX(0, ROUND((JULIANDAY(end_time) - JULIANDAY(start_time)) * 1440)))
+                            ELSE 0 END
+                FROM pomodoro_sessions WHERE user_id = ?
+            """, (self.user_id,))
+            sessions = cursor.fetchall()
+        
+        return tasks, sessions
+    
     # === POMODORO MANAGEMENT ===
     
-    def start_pomodoro(self, task_id: int = None) -> str:
-        """Avvia una sessione Pomodoro"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        start_time = datetime.now()
-        
-        cursor.execute("""
-            INSERT INTO pomodoro_sessions (task_id, start_time, duration_minutes, completed)
-            VALUES (?, ?, 25, 0)
-        """, (task_id, start_time))
-        
-        session_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+    def create_pomodoro_session(self, task_id: int = None, duration_minutes: int = 25, start_time: datetime = None) -> int:
+        """Crea una sessione Pomodoro e restituisce il suo ID"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO pomodoro_sessions (user_id, task_id, start_time, duration_minutes, completed)
+                VALUES (?, ?, ?, ?, 0)
+            """, (self.user_id, task_id, start_time or datetime.now(), duration_minutes))
+            
+            session_id = cursor.lastrowid
+            conn.commit()
         
-        return f"🍅 Pomodoro avviato (ID: {session_id}) - Focus per 25 minuti!"
+        return session_id
     
-    def complete_pomodoro(self, session_id: int, notes: str = "") -> str:
-        """Completa una sessione Pomodoro"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        end_time = datetime.now()
-        
-        cursor.execute("""
-            UPDATE pomodoro_sessions 
-            SET completed = 1, end_time = ?, notes = ?
-            WHERE id = ?
-        """, (end_time, notes, session_id))
-        
-        if cursor.rowcount > 0:
+    def start_pomodoro(self, task_id: int = None, duration_minutes: int = 25) -> str:
+        """Avvia una sessione Pomodoro"""
+        if task_id is not None and not self.has_task(task_id):
+            return f"❌ Task {task_id} non trovato"
+        session_id = self.create_pomodoro_session(task_id, duration_minutes)
+        return f"🍅 Pomodoro avviato (ID: {session_id}) - Focus per {duration_minutes} minuti!"
+    
+    def complete_pomodoro(self, session_id: int, notes: str = "", end_time: datetime = None) -> str:
+        """Completa una sessione Pomodoro
+        
+        I minuti di focus (durata effettiva, al massimo quella pianificata)
+        vengono sommati ad actual_minutes del task collegato.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            end_time = end_time or datetime.now()
+            
+            cursor.execute("""
+                SELECT task_id, start_time, duration_minutes FROM pomodoro_sessions
+                WHERE id = ? AND user_id = ? AND completed = 0
+            """, (session_id, self.user_id))
+            session = cursor.fetchone()
+            
+            if not session:
+                return f"❌ Sessione Pomodoro {session_id} non trovata o già completata"
+            
+            task_id, start_time, duration = session
+            elapsed = (end_time - datetime.fromisoformat(str(start_time))).total_seconds() / 60
+            focused_minutes = max(0, min(round(elapsed), duration or 0))
+            
+            cursor.execute("""
+                UPDATE pomodoro_sessions 
+                SET completed = 1, end_time = ?, notes = ?
+                WHERE id = ?
+            """, (end_time, notes, session_id))
+            
+            if task_id is not None:
+                cursor.execute("""
+                    UPDATE tasks SET actual_minutes = COALESCE(actual_minutes, 0) + ?
+                    WHERE id = ? AND user_id = ?
+                """, (focused_minutes, task_id, self.user_id))
+            
+            conn.commit()
+        return f"✅ Pomodoro {session_id} completato! Focus: {focused_minutes}min"
+    
+    def save_pomodoro_timer(self, timer: dict) -> int:
+        """Inserisce o aggiorna lo stato di un timer Pomodoro"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            values = (timer.get('task_id'), timer.get('session_id'), timer['phase'],
+                      timer['current_cycle'], timer['total_cycles'], timer['phase_ends_at'])
+            
+            if timer.get('id'):
+                cursor.execute("""
+                    UPDATE pomodoro_timers
+                    SET task_id = ?, session_id = ?, phase = ?, current_cycle = ?, total_cycles = ?, phase_ends_at = ?
+                    WHERE id = ? AND user_id = ?
+                """, values + (timer['id'], self.user_id))
+                timer_id = timer['id']
+            else:
+                cursor.execute("""
+                    INSERT INTO pomodoro_timers (task_id, session_id, phase, current_cycle, total_cycles, phase_ends_at, user_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, values + (self.user_id,))
+                timer_id = cursor.lastrowid
+            
             conn.commit()
-            conn.close()
-            return f"✅ Pomodoro {session_id} completato!"
-        else:
-            conn.close()
-            return f"❌ Sessione Pomodoro {session_id} non trovata"
+        return timer_id
+    
+    def get_active_pomodoro_timers(self, all_users: bool = False) -> list:
+        """Timer Pomodoro ancora in corso (fase focus o pausa)
+        
+        all_users: timer di tutti gli utenti (usato dallo scheduler condiviso)
+        """
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT id, user_id, task_id, session_id, phase, current_cycle, total_cycles, phase_ends_at
+                FROM pomodoro_timers WHERE phase IN ('focus', 'break') AND (? OR user_id = ?) ORDER BY id ASC
+            """, (all_users, self.user_id))
+            timers = [dict(row) for row in cursor.fetchall()]
+        
+        for timer in timers:
+            timer['phase_ends_at'] = datetime.fromisoformat(str(timer['phase_ends_at']))
+        return timers
+    
+    def get_pomodoro_stats(self) -> str:
+        """Statistiche delle sessioni Pomodoro di oggi, per task"""
+        today = datetime.now().date()
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT p.task_id, t.title, COUNT(*),
+                       SUM(CASE WHEN p.completed = 1 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN p.completed = 1
+                           THEN MIN(p.duration_minutes, MAX(0, ROUND((JULIANDAY(p.end_time) - JULIANDAY(p.start_time)) * 1440)))
+                           ELSE 0 END)
+                FROM pomodoro_sessions p LEFT JOIN tasks t ON t.id = p.task_id AND t.user_id = p.user_id
+                WHERE p.user_id = ? AND DATE(p.start_time) = ?
+                GROUP BY p.task_id ORDER BY p.task_id
+            """, (self.user_id, today))
+            rows = cursor.fetchall()
+        
+        if not rows:
+            return "🍅 Nessuna sessione Pomodoro oggi"
+        
+        result = "🍅 Pomodoro di oggi:\n"
+        for task_id, title, sessions, completed, minutes in rows:
+            label = f"Task {task_id}: {title}" if task_id is not None else "Senza task"
+            result += f"• {label} - {completed}/{sessions} sessioni, {int(minutes or 0)}min di focus\n"
+        return result
     
     # === DAILY SUMMARY ===
     
@@ -284,37 +543,35 @@ class DatabaseManager:
         """Genera un riepilogo della giornata"""
         today = datetime.now().date()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Task completati oggi
-        cursor.execute("""
-            SELECT COUNT(*) FROM tasks 
-            WHERE status = 'completed' AND DATE(completed_at) = ?
-        """, (today,))
-        completed_tasks = cursor.fetchone()[0]
-        
-        # Task pending
-        cursor.execute("""
-            SELECT COUNT(*) FROM tasks WHERE status = 'pending'
-        """, ())
-        pending_tasks = cursor.fetchone()[0]
-        
-        # Abitudini completate oggi
-        cursor.execute("""
-            SELECT COUNT(*) FROM habit_logs 
-            WHERE date = ? AND completed = 1
-        """, (today,))
-        habits_done = cursor.fetchone()[0]
-        
-        # Sessioni Pomodoro
-        cursor.execute("""
-            SELECT COUNT(*) FROM pomodoro_sessions 
-            WHERE DATE(start_time) = ? AND completed = 1
-        """, (today,))
-        pomodoros = cursor.fetchone()[0]
-        
-        conn.close()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            # Task completati oggi
+            cursor.execute("""
+                SELECT COUNT(*) FROM tasks 
+                WHERE user_id = ? AND status = 'completed' AND DATE(completed_at) = ?
+            """, (self.user_id, today))
+            completed_tasks = cursor.fetchone()[0]
+            
+            # Task pending
+            cursor.execute("""
+                SELECT COUNT(*) FROM tasks WHERE user_id = ? AND status = 'pending'
+            """, (self.user_id,))
+            pending_tasks = cursor.fetchone()[0]
+            
+            # Abitudini completate oggi
+            cursor.execute("""
+                SELECT COUNT(*) FROM habit_logs 
+                WHERE user_id = ? AND date = ? AND completed = 1
+            """, (self.user_id, today))
+            habits_done = cursor.fetchone()[0]
+            
+            # Sessioni Pomodoro
+            cursor.execute("""
+                SELECT COUNT(*) FROM pomodoro_sessions 
+                WHERE user_id = ? AND DATE(start_time) = ? AND completed = 1
+            """, (self.user_id, today))
+            pomodoros = cursor.fetchone()[0]
         
         return f"""📊 Riepilogo di oggi:
 • ✅ Task completati: {completed_tasks}
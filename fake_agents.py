@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Fake Agents - Sostituti di LocalAgent e RemoteAgent senza modelli né rete
+
+Rispondono in modo deterministico con una latenza configurabile: servono a
+provare e a fare load test di API server e knowledge base in locale, senza
+Ollama né GOOGLE_API_KEY. FakeRemoteAgent.online = False simula un
+disservizio del provider remoto.
+"""
+
+import hashlib
+import math
+import time
+from circuit_breaker import CircuitBreaker
+
+# Dimensione degli embedding finti
+FAKE_EMBEDDING_DIMENSIONS = 256
+
+def fake_embedding(text, dimensions=FAKE_EMBEDDING_DIMENSIONS):
+    """Embedding deterministico: hashing delle parole, normalizzato"""
+    vector = [0.0] * dimensions
+    for word in text.lower().split():
+        digest = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16)
+        vector[digest % dimensions] += 1.0 if digest & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+class FakeLocalAgent:
+    def __init__(self, latency=0.05, chunks=5):
+        self.model_name = "fake-local"
+        self.latency = latency
+        self.chunks = chunks
+
+    def test_connection(self):
+        """Nessuna connessione da verificare"""
+        print("✅ Agente locale finto: OK")
+        return True
+
+    def _answer(self, prompt, context=""):
+        return (f"[{self.model_name}] Risposta a: {prompt} "
+                f"(contesto: {len(context)} caratteri)")
+
+    def generate_response(self, prompt, context=""):
+        """Risposta fissa dopo la latenza simulata"""
+        time.sleep(self.latency)
+        return self._answer(prompt, context)
+
+    def generate_response_stream(self, prompt, context=""):
+        """Stessa risposta divisa in frammenti"""
+        words = self._answer(prompt, context).split(" ")
+        size = max(1, math.ceil(len(words) / self.chunks))
+        for start in range(0, len(words), size):
+            time.sleep(self.latency / self.chunks)
+            yield " ".join(words[start:start + size]) + (" " if start + size < len(words) else "")
+
+    def set_model(self, model_name):
+        self.model_name = model_name
+        return f"Modello cambiato a: {model_name}"
+
+class FakeRemoteAgent(FakeLocalAgent):
+    def __init__(self, latency=0.2, chunks=10, embedding_latency=0.01, breaker=None):
+        super().__init__(latency, chunks)
+        self.model_name = "fake-remote"
+        self.embedding_latency = embedding_latency
+        self.breaker = breaker or CircuitBreaker()
+        self.online = True
+
+    def test_connection(self):
+        print("✅ Agente remoto finto: OK")
+        return True
+
+    def _call(self, produce):
+        """Esegue una chiamata simulata rispettando circuito e stato online"""
+        if not self.breaker.allow():
+            return None
+        if not self.online:
+            self.breaker.record_failure("servizio remoto finto offline")
+            return None
+        result = produce()
+        self.breaker.record_success()
+        return result
+
+    def generate_response(self, prompt, context="", temperature=0.7, max_tokens=1000):
+        return self._call(lambda: FakeLocalAgent.generate_response(self, prompt, context))
+
+    def generate_response_stream(self, prompt, context="", temperature=0.7, max_tokens=1000):
+        if self._call(lambda: True):
+            yield from FakeLocalAgent.generate_response_stream(self, prompt, context)
+
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=None):
+        """Embedding deterministico (testi con parole in comune sono vicini)"""
+        time.sleep(self.embedding_latency)
+        return self._call(lambda: fake_embedding(text, output_dimensionality or FAKE_EMBEDDING_DIMENSIONS))
+
+    def generate_embeddings(self, texts, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=None, batch_size=100):
+        time.sleep(self.embedding_latency * math.ceil(len(texts) / batch_size))
+        return self._call(lambda: [fake_embedding(text, output_dimensionality or FAKE_EMBEDDING_DIMENSIONS)
+                                   for text in texts])
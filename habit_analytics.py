@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Habit Analytics - Streak, percentuali di completamento e heatmap delle abitudini
+
+Tutti i log vengono caricati una sola volta in una bitmap NumPy
+(abitudini x giorni) e le statistiche sono calcolate in modo vettoriale per
+tutte le abitudini insieme. I risultati restano in cache finché
+DatabaseManager non registra nuovi log (habit_version).
+"""
+
+import threading
+from datetime import date, timedelta
+import numpy as np
+
+# Finestre (giorni) per le percentuali di completamento
+RATE_WINDOWS = (7, 30, 90)
+
+# Livelli della heatmap, dal vuoto al pieno
+HEATMAP_LEVELS = " ░▒▓█"
+
+class HabitAnalytics:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._cache = None
+        self._cache_key = None
+        self._lock = threading.Lock()
+
+    def compute(self, today=None):
+        """Calcola le statistiche di tutte le abitudini attive
+
+        Restituisce un dizionario con start (primo giorno della bitmap),
+        habits (lista di statistiche per abitudine), bitmap e active.
+        """
+        today = today or date.today()
+        key = (self.db_manager.habit_version, today)
+
+        with self._lock:
+            if self._cache_key == key:
+                return self._cache
+
+            habits, logs = self.db_manager.load_habit_data()
+            self._cache = self._compute(habits, logs, today)
+            self._cache_key = key
+            return self._cache
+
+    def _compute(self, habits, logs, today):
+        if not habits:
+            return {'start': today, 'habits': [], 'bitmap': np.zeros((0, 1), dtype=bool),
+                    'active': np.zeros((0, 1), dtype=bool)}
+
+        # Date come giorni dall'epoch Unix
+        today_day = (today - date(1970, 1, 1)).days
+        habit_ids = np.array([habit_id for habit_id, _, _ in habits], dtype=np.int64)
+        created = np.array([created_day for _, _, created_day in habits], dtype=np.int64)
+        created = np.minimum(created, today_day)
+
+        logs = np.array(logs, dtype=np.int64).reshape(-1, 2)
+
+        # Mappa habit_id -> riga scartando i log di abitudini non attive
+        order = np.argsort(habit_ids)
+        positions = np.searchsorted(habit_ids[order], logs[:, 0])
+        positions = np.minimum(positions, len(habit_ids) - 1)
+        known = habit_ids[order][positions] == logs[:, 0]
+        rows = order[positions[known]]
+        days = logs[known, 1]
+
+        start = int(min(created.min(), days.min())) if len(days) else int(created.min())
+        n_days = today_day - start + 1
+
+        # Bitmap abitudini x giorni (log futuri ignorati)
+        offsets = days - start
+        valid = offsets < n_days
+        bitmap = np.zeros((len(habits), n_days), dtype=bool)
+        bitmap[rows[valid], offsets[valid]] = True
+
+        created_offset = created - start
+        active = np.arange(n_days)[None, :] >= created_offset[:, None]
+
+        current = self._current_streaks(bitmap)
+        longest = self._longest_streaks(bitmap)
+        rates = {
+            window: bitmap[:, -window:].sum(axis=1)
+            / np.maximum(n_days - np.maximum(created_offset, n_days - window), 1)
+            for window in RATE_WINDOWS
+        }
+
+        stats = []
+        for i, (habit_id, name, _) in enumerate(habits):
+            stats.append({
+                'id': habit_id,
+                'name': name,
+                'current_streak': int(current[i]),
+                'longest_streak': int(longest[i]),
+                'rates': {window: float(rates[window][i]) for window in RATE_WINDOWS},
+                'last_7_days': bitmap[i, -7:].tolist(),
+                'done_today': bool(bitmap[i, -1])
+            })
+
+        return {'start': date(1970, 1, 1) + timedelta(days=start), 'habits': stats, 'bitmap': bitmap, 'active': active}
+
+    @staticmethod
+    def _trailing_run(bitmap):
+        """Lunghezza della sequenza di True che termina nell'ultima colonna"""
+        if bitmap.shape[1] == 0:
+            return np.zeros(bitmap.shape[0], dtype=np.int64)
+        reversed_bits = bitmap[:, ::-1]
+        return np.where(reversed_bits.all(axis=1), bitmap.shape[1], (~reversed_bits).argmax(axis=1))
+
+    def _current_streaks(self, bitmap):
+        """Streak attuale: se oggi non è ancora registrato conta fino a ieri"""
+        until_today = self._trailing_run(bitmap)
+        until_yesterday = self._trailing_run(bitmap[:, :-1])
+        return np.where(bitmap[:, -1], until_today, until_yesterday)
+
+    @staticmethod
+    def _longest_streaks(bitmap):
+        """Streak più lunga per riga tramite run-length encoding vettoriale"""
+        padded = np.zeros((bitmap.shape[0], bitmap.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = bitmap
+        changes = np.diff(padded, axis=1)
+        starts = np.argwhere(changes == 1)
+        ends = np.argwhere(changes == -1)
+
+        longest = np.zeros(bitmap.shape[0], dtype=np.int64)
+        np.maximum.at(longest, starts[:, 0], ends[:, 1] - starts[:, 1])
+        return longest
+
+    def get_habit_stats(self) -> str:
+        """Riepilogo testuale di streak e percentuali per abitudine"""
+        habits = self.compute()['habits']
+        if not habits:
+            return "🏃‍♂️ Nessuna abitudine configurata"
+
+        result = "📈 Statistiche abitudini:\n"
+        for habit in habits:
+            week = "".join("■" if done else "□" for done in habit['last_7_days'])
+            rates = " / ".join(f"{habit['rates'][window]:.0%}" for window in RATE_WINDOWS)
+            result += (f"• ID {habit['id']}: {habit['name']} - 🔥 {habit['current_streak']}gg "
+                       f"(record {habit['longest_streak']}gg), "
+                       f"7/30/90gg: {rates}, ultimi 7gg: {week}\n")
+        return result
+
+    def get_heatmap(self, weeks: int = 12) -> str:
+        """Heatmap settimanale della percentuale di abitudini completate"""
+        data = self.compute()
+        if not data['habits']:
+            return "🏃‍♂️ Nessuna abitudine configurata"
+
+        bitmap, active = data['bitmap'], data['active']
+        done = bitmap.sum(axis=0)
+        total = active.sum(axis=0)
+
+        # Allinea le colonne al lunedì e prende le ultime settimane
+        today = data['start'] + timedelta(days=bitmap.shape[1] - 1)
+        first_day = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+        offset = (first_day - data['start']).days
+
+        result = f"🗓️ Heatmap abitudini (ultime {weeks} settimane):\n"
+        for weekday, label in enumerate(("Lun", "Mar", "Mer", "Gio", "Ven", "Sab", "Dom")):
+            row = ""
+            for week in range(weeks):
+                day = offset + week * 7 + weekday
+                if day < 0 or day >= bitmap.shape[1] or total[day] == 0:
+                    row += "·"
+                    continue
+                level = int(round(done[day] / total[day] * (len(HEATMAP_LEVELS) - 1)))
+                row += HEATMAP_LEVELS[level]
+            result += f"{label} {row}\n"
+        return result
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion - Pipeline di acquisizione documenti per la knowledge base
+
+File -> estrattore (per formato, lettura in streaming) -> paragrafi
+     -> normalizzazione -> chunk -> simhash per la deduplicazione
+
+Formati supportati: .txt, .md, .html/.htm, .jsonl, .csv, .pdf (solo testo).
+Nuovi formati si aggiungono con register_extractor().
+"""
+
+import os
+import re
+import csv
+import json
+import zlib
+import hashlib
+import unicodedata
+from html.parser import HTMLParser
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Dimensione massima (caratteri) di un chunk inviato all'embedding
+DEFAULT_CHUNK_CHARS = 2000
+
+# Blocchi letti dai file in streaming
+READ_BLOCK_BYTES = 64 * 1024
+
+# Distanza di Hamming massima tra simhash di passaggi quasi identici
+SIMHASH_DISTANCE = 3
+
+# Campi usati come testo nei record JSONL
+JSONL_TEXT_FIELDS = ("text", "content", "body")
+
+EXTRACTORS = {}
+
+def register_extractor(extension, extractor):
+    """Registra un estrattore: funzione(path) che restituisce un iteratore di paragrafi"""
+    EXTRACTORS[extension.lower()] = extractor
+
+def supported_extensions():
+    """Estensioni gestite dalla pipeline"""
+    return tuple(EXTRACTORS)
+
+def get_extractor(filename):
+    """Estrattore associato all'estensione del file (None se non supportato)"""
+    return EXTRACTORS.get(os.path.splitext(filename)[1].lower())
+
+# === ESTRATTORI ===
+
+def _paragraphs_from_lines(lines, clean_line=None):
+    """Raggruppa le righe in paragrafi separati da righe vuote"""
+    paragraph = []
+    for line in lines:
+        if clean_line:
+            line = clean_line(line)
+        if line is None:
+            continue
+        if line.strip():
+            paragraph.append(line.strip())
+        elif paragraph:
+            yield " ".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield " ".join(paragraph)
+
+def extract_text(path):
+    """Testo semplice, letto riga per riga"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from _paragraphs_from_lines(f)
+
+_MD_IMAGE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+_MD_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_MD_EMPHASIS = re.compile(r'(\*\*|__|\*|_|`)')
+
+def extract_markdown(path):
+    """Markdown: rimuove intestazioni, enfasi, link e recinti di codice"""
+    def clean(line):
+        if line.lstrip().startswith("```"):
+            return ""
+        line = re.sub(r'^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+', '', line)
+        line = _MD_IMAGE.sub(r'\1', line)
+        line = _MD_LINK.sub(r'\1', line)
+        return _MD_EMPHASIS.sub('', line)
+
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        yield from _paragraphs_from_lines(f, clean)
+
+class _HTMLTextParser(HTMLParser):
+    """Estrae il testo visibile, spezzando sui tag di blocco"""
+
+    BLOCK_TAGS = {"p", "div", "li", "br", "tr", "section", "article", "blockquote",
+                  "h1", "h2", "h3", "h4", "h5", "h6", "pre", "td", "th"}
+    SKIP_TAGS = {"script", "style", "head", "noscript"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []
+        self._buffer = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        text = " ".join("".join(self._buffer).split())
+        if text:
+            self.paragraphs.append(text)
+        self._buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+def extract_html(path):
+    """HTML: parser incrementale alimentato a blocchi"""
+    parser = _HTMLTextParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(READ_BLOCK_BYTES)
+            if not block:
+                break
+            parser.feed(block)
+            yield from parser.paragraphs
+            parser.paragraphs = []
+    parser.close()
+    parser._flush()
+    yield from parser.paragraphs
+
+def extract_jsonl(path):
+    """JSONL: un paragrafo per record (campo text/content/body o tutti i valori testuali)"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, str):
+                yield record
+                continue
+            if not isinstance(record, dict):
+                continue
+            for field in JSONL_TEXT_FIELDS:
+                if isinstance(record.get(field), str):
+                    yield record[field]
+                    break
+            else:
+                values = [str(value) for value in record.values() if isinstance(value, str)]
+                if values:
+                    yield " ".join(values)
+
+def extract_csv(path):
+    """CSV: una riga per paragrafo, nel formato 'colonna: valore; ...'"""
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for row in reader:
+            cells = [f"{name}: {value}" for name, value in zip(header, row) if value.strip()]
+            if cells:
+                yield "; ".join(cells)
+
+_PDF_STREAM = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+_PDF_TEXT_BLOCK = re.compile(rb'BT(.*?)ET', re.S)
+_PDF_TEXT_OP = re.compile(rb'(\((?:\\.|[^\\)])*\))\s*(?:Tj|\'|")|\[((?:\\.|[^\]])*)\]\s*TJ|(T\*|Td|TD)')
+_PDF_STRING = re.compile(rb'\((?:\\.|[^\\)])*\)')
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'(': b'(', b')': b')', b'\\': b'\\'}
+
+def _decode_pdf_string(raw):
+    """Decodifica una stringa letterale PDF '(...)'"""
+    raw = raw[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i:i + 1]
+        if char == b'\\' and i + 1 < len(raw):
+            following = raw[i + 1:i + 2]
+            octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4])
+            if octal:
+                out.append(int(octal.group(), 8) & 0xFF)
+                i += 1 + len(octal.group())
+                continue
+            out += _PDF_ESCAPES.get(following, following)
+            i += 2
+            continue
+        out += char
+        i += 1
+    return out.decode('latin-1')
+
+def _pdf_text_streams(path):
+    """Contenuto (decompresso se FlateDecode) degli stream del PDF"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for match in _PDF_STREAM.finditer(data):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        if b'BT' in stream:
+            yield stream
+
+def extract_pdf(path):
+    """PDF testuali: pypdf se installato, altrimenti parser minimale degli operatori Tj/TJ"""
+    if PdfReader is not None:
+        for page in PdfReader(path).pages:
+            yield from _paragraphs_from_lines((page.extract_text() or "").splitlines())
+        return
+
+    for stream in _pdf_text_streams(path):
+        lines = []
+        for block in _PDF_TEXT_BLOCK.finditer(stream):
+            line = []
+            for op in _PDF_TEXT_OP.finditer(block.group(1)):
+                if op.group(1):
+                    line.append(_decode_pdf_string(op.group(1)))
+                elif op.group(2) is not None:
+                    line.append("".join(_decode_pdf_string(s) for s in _PDF_STRING.findall(op.group(2))))
+                elif line:
+                    lines.append("".join(line))
+                    line = []
+            if line:
+                lines.append("".join(line))
+        yield from _paragraphs_from_lines(lines + [""])
+
+register_extractor(".txt", extract_text)
+register_extractor(".md", extract_markdown)
+register_extractor(".markdown", extract_markdown)
+register_extractor(".html", extract_html)
+register_extractor(".htm", extract_html)
+register_extractor(".jsonl", extract_jsonl)
+register_extractor(".csv", extract_csv)
+register_extractor(".pdf", extract_pdf)
+
+# === NORMALIZZAZIONE E CHUNKING ===
+
+def normalize_text(text):
+    """Normalizza Unicode e spazi"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+def chunk_paragraphs(paragraphs, max_chars=DEFAULT_CHUNK_CHARS):
+    """Accorpa i paragrafi in chunk di al massimo max_chars caratteri"""
+    current = []
+    size = 0
+    for paragraph in paragraphs:
+        paragraph = normalize_text(paragraph)
+        if not paragraph:
+            continue
+
+        # Paragrafi troppo lunghi vengono spezzati sugli spazi
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                yield "\n".join(current)
+                current, size = [], 0
+            yield paragraph[:cut]
+            paragraph = paragraph[cut:].strip()
+
+        if current and size + len(paragraph) + 1 > max_chars:
+            yield "\n".join(current)
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 1
+    if current:
+        yield "\n".join(current)
+
+# === DEDUPLICAZIONE ===
+
+def simhash(text, shingle_size=3):
+    """Simhash a 64 bit sugli shingle di parole del testo normalizzato"""
+    words = re.findall(r'\w+', text.lower())
+    if not words:
+        return 0
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    result = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            result |= 1 << bit
+    return result
+
+class SimhashIndex:
+    """Ricerca di simhash entro SIMHASH_DISTANCE bit
+
+    Il simhash è diviso in 4 bande da 16 bit: due valori che differiscono
+    per al massimo 3 bit coincidono in almeno una banda.
+    """
+
+    BANDS = 4
+
+    def __init__(self, max_distance=SIMHASH_DISTANCE):
+        self.max_distance = max_distance
+        self._buckets = [{} for _ in range(self.BANDS)]
+        self._hashes = {}
+
+    def _bands(self, value):
+        return [(value >> (16 * band)) & 0xFFFF for band in range(self.BANDS)]
+
+    def find(self, value):
+        """doc_id di un passaggio quasi identico già indicizzato, o None"""
+        for band, key in enumerate(self._bands(value)):
+            for doc_id in self._buckets[band].get(key, ()):
+                if bin(self._hashes[doc_id] ^ value).count("1") <= self.max_distance:
+                    return doc_id
+        return None
+
+    def add(self, doc_id, value):
+        self.remove(doc_id)
+        self._hashes[doc_id] = value
+        for band, key in enumerate(self._bands(value)):
+            self._buckets[band].setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        value = self._hashes.pop(doc_id, None)
+        if value is None:
+            return
+        for band, key in enumerate(self._bands(value)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+# === PIPELINE ===
+
+def file_hash(path):
+    """SHA-1 del contenuto del file, letto a blocchi"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_file(path, max_chars=DEFAULT_CHUNK_CHARS):
+    """Estrae e spezza un file in chunk: lista di (testo, simhash)"""
+    extractor = get_extractor(path)
+    if extractor is None:
+        raise ValueError(f"Formato non supportato: {os.path.basename(path)}")
+    return [(chunk, simhash(chunk)) for chunk in chunk_paragraphs(extractor(path), max_chars)]
+
+def iter_parse_files(paths, max_chars=DEFAULT_CHUNK_CHARS, max_workers=None):
+    """Elabora più file in parallelo su un pool di processi
+
+    Genera (path, lista di chunk) oppure (path, eccezione) man mano che i file
+    sono pronti. Al massimo due file per processo sono in elaborazione o in
+    attesa: il chiamante indicizza un file mentre i successivi vengono letti,
+    senza tenere in memoria i chunk di tutti i file modificati.
+    """
+    if len(paths) <= 1 or max_workers == 1:
+        for path in paths:
+            try:
+                yield path, parse_file(path, max_chars)
+            except Exception as e:
+                yield path, e
+        return
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = 2 * workers
+        remaining = iter(paths)
+        running = {}
+        for path in remaining:
+            running[executor.submit(parse_file, path, max_chars)] = path
+            if len(running) >= window:
+                break
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    running[executor.submit(parse_file, next_path, max_chars)] = next_path
+                try:
+                    yield path, future.result()
+                except Exception as e:
+                    yield path, e
+
+def parse_files(paths, max_chars=DEFAULT_CHUNK_CHARS, max_workers=None):
+    """Come iter_parse_files, ma restituisce {path: lista di chunk o eccezione}"""
+    return dict(iter_parse_files(paths, max_chars, max_workers))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Knowledge Watcher - Aggiornamento in background della knowledge base
+
+Osserva la cartella della knowledge base (inotify tramite watchdog, se
+installato, altrimenti polling) e, dopo un intervallo di debounce,
+indicizza, aggiorna o elimina i documenti modificati senza bloccare la REPL.
+"""
+
+import os
+import threading
+import time
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+class _WatchdogHandler(FileSystemEventHandler):
+    """Inoltra gli eventi del filesystem al watcher"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, 'src_path', None), getattr(event, 'dest_path', None)):
+            if path:
+                self.watcher.notify(os.path.basename(path))
+
+class KnowledgeWatcher:
+    def __init__(self, rag_system, debounce_seconds=2.0, poll_interval=2.0, use_inotify=True):
+        self.rag_system = rag_system
+        self.kb_path = rag_system.kb_path
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.mode = "inotify" if use_inotify and Observer is not None else "polling"
+
+        self._pending = {}
+        self._in_progress = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._snapshot = {}
+
+        self.processed = 0
+        self.last_event = None
+        self.last_error = None
+
+    def start(self):
+        """Avvia il watcher in un thread daemon"""
+        if self._thread and self._thread.is_alive():
+            return "⚠️ Watcher già attivo"
+
+        self._stop.clear()
+        self._snapshot = self._scan()
+
+        if self.mode == "inotify":
+            self._observer = Observer()
+            self._observer.schedule(_WatchdogHandler(self), self.kb_path, recursive=False)
+            self._observer.daemon = True
+            self._observer.start()
+
+        self._thread = threading.Thread(target=self._run, name="knowledge-watcher", daemon=True)
+        self._thread.start()
+        return f"👀 Watcher knowledge base avviato ({self.mode})"
+
+    def stop(self):
+        """Arresta il watcher"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self, filename):
+        """Registra una modifica; il file viene elaborato dopo il debounce"""
+        if not self.rag_system.is_knowledge_file(filename):
+            return
+        with self._condition:
+            # Ogni nuovo evento sullo stesso file sposta in avanti la scadenza
+            self._pending[filename] = time.monotonic() + self.debounce_seconds
+            self._condition.notify()
+
+    def _scan(self):
+        """Snapshot (mtime, size) dei file indicizzabili"""
+        snapshot = {}
+        try:
+            with os.scandir(self.kb_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and self.rag_system.is_knowledge_file(entry.name):
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def _poll(self):
+        """Confronta lo snapshot corrente con il precedente (modalità polling)"""
+        snapshot = self._scan()
+        for filename in set(snapshot) | set(self._snapshot):
+            if snapshot.get(filename) != self._snapshot.get(filename):
+                self.notify(filename)
+        self._snapshot = snapshot
+
+    def _next_due(self):
+        """Estrae un file la cui finestra di debounce è scaduta"""
+        now = time.monotonic()
+        for filename, due in self._pending.items():
+            if due <= now:
+                del self._pending[filename]
+                return filename, None
+        wait = min(self._pending.values()) - now if self._pending else self.poll_interval
+        return None, wait
+
+    def _run(self):
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            if self.mode == "polling" and time.monotonic() >= next_poll:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_interval
+
+            with self._condition:
+                filename, wait = self._next_due()
+                if filename is None:
+                    if self.mode == "polling":
+                        wait = min(wait, max(next_poll - time.monotonic(), 0))
+                    self._condition.wait(timeout=wait)
+                    continue
+                self._in_progress = filename
+
+            try:
+                self._process(filename)
+            finally:
+                with self._condition:
+                    self._in_progress = None
+
+    def _process(self, filename):
+        """Indicizza, aggiorna o elimina il documento di un file"""
+        try:
+            if os.path.exists(os.path.join(self.kb_path, filename)):
+                message = self.rag_system.sync_file(filename)
+            else:
+                message = self.rag_system.remove_file(filename)
+            self.processed += 1
+            if message:
+                self.last_event = message
+        except Exception as e:
+            self.last_error = f"{filename}: {e}"
+
+    def status(self):
+        """Restituisce lo stato del watcher e il lavoro in attesa"""
+        with self._condition:
+            pending = sorted(self._pending)
+            in_progress = self._in_progress
+
+        running = self._thread is not None and self._thread.is_alive()
+        result = f"👀 Watcher knowledge base: {'attivo' if running else 'fermo'} ({self.mode})\n"
+        result += f"• In elaborazione: {in_progress or '-'}\n"
+        result += f"• In attesa: {', '.join(pending) if pending else 'nessuno'}\n"
+        result += f"• File elaborati: {self.processed}"
+        if self.last_event:
+            result += f"\n• Ultimo aggiornamento: {self.last_event}"
+        if self.last_error:
+            result += f"\n• Ultimo errore: {self.last_error}"
+        return result
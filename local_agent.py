@@ -28,16 +28,20 @@ class LocalAgent:
             print(f"❌ Errore Ollama: {e}")
             return False
     
-    def generate_response(self, prompt, context=""):
-        """Genera una risposta usando l'agente locale"""
-        try:
-            full_prompt = f"""Sei TimeMind, un coach personale per la produttività e la gestione del tempo.
+    def _build_prompt(self, prompt, context=""):
+        """Prompt completo con il contesto della knowledge base"""
+        return f"""Sei TimeMind, un coach personale per la produttività e la gestione del tempo.
             
 {context}
 
 Domanda dell'utente: {prompt}
 
 Rispondi in modo utile e pratico, usando un tono amichevole ma professionale."""
+    
+    def generate_response(self, prompt, context=""):
+        """Genera una risposta usando l'agente locale"""
+        try:
+            full_prompt = self._build_prompt(prompt, context)
 
             response = requests.post(
                 self.ollama_url,
@@ -56,6 +60,36 @@ Rispondi in modo utile e pratico, usando un tono amichevole ma professionale."""
         except Exception as e:
             return f"Errore agente locale: {e}"
     
+    def generate_response_stream(self, prompt, context=""):
+        """Genera la risposta a frammenti man mano che Ollama la produce"""
+        try:
+            response = requests.post(
+                self.ollama_url,
+                json={
+                    "model": self.model_name,
+                    "prompt": self._build_prompt(prompt, context),
+                    "stream": True
+                },
+                stream=True
+            )
+            
+            if response.status_code != 200:
+                yield f"Errore connessione Ollama: {response.status_code}"
+                return
+            
+            # Ollama invia un oggetto JSON per riga
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get('response'):
+                    yield data['response']
+                if data.get('done'):
+                    break
+                
+        except Exception as e:
+            yield f"Errore agente locale: {e}"
+    
     def set_model(self, model_name):
         """Cambia il modello utilizzato"""
         self.model_name = model_name
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Outbox - Coda persistente dei lavori di indicizzazione in attesa del servizio remoto
+
+Quando gli embedding non sono disponibili (Gemini non raggiungibile o
+circuito aperto) documenti e file vengono salvati in una tabella SQLite
+invece di andare persi. OutboxWorker li riprova in background con backoff
+esponenziale e resta in attesa mentre il circuito di RemoteAgent è aperto.
+I job che falliscono troppe volte a servizio disponibile passano allo stato
+'failed' (dead letter): restano salvati ma non vengono più riprovati finché
+non sono accodati di nuovo.
+"""
+
+import json
+import random
+import threading
+import time
+from connection_pool import get_pool
+
+class Outbox:
+    def __init__(self, db_path="./timemind_outbox.db"):
+        self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.init_database()
+
+    def init_database(self):
+        """Crea la tabella dei job"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+
+            # Un solo job per (kind, key): le nuove versioni sostituiscono il payload
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS outbox_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    version INTEGER DEFAULT 1,
+                    attempts INTEGER DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (kind, key)
+                )
+            """)
+
+            # Code create prima dello stato 'failed': tutti i job sono in attesa
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(outbox_jobs)")]
+            if "status" not in columns:
+                cursor.execute("ALTER TABLE outbox_jobs ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'")
+
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_jobs_next ON outbox_jobs (next_attempt_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_jobs_status_next ON outbox_jobs (status, next_attempt_at)")
+
+            conn.commit()
+
+    def enqueue(self, kind, key, payload):
+        """Aggiunge un job o ne aggiorna il payload
+
+        Per un job in attesa tentativi e backoff restano invariati; un job
+        fallito torna in coda da zero tentativi.
+        """
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                INSERT INTO outbox_jobs (kind, key, payload, next_attempt_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    version = version + (payload != excluded.payload),
+                    payload = excluded.payload,
+                    attempts = CASE WHEN status = 'failed' THEN 0 ELSE attempts END,
+                    next_attempt_at = CASE WHEN status = 'failed' THEN excluded.next_attempt_at ELSE next_attempt_at END,
+                    status = 'pending'
+            """, (kind, key, json.dumps(payload, ensure_ascii=False), time.time()))
+
+            conn.commit()
+
+    def due(self, limit=20):
+        """Job in attesa il cui prossimo tentativo è scaduto, dal più vecchio"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT id, kind, key, payload, version, attempts FROM outbox_jobs
+                WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at ASC LIMIT ?
+            """, (time.time(), limit))
+
+            jobs = [
+                {'id': job_id, 'kind': kind, 'key': key, 'payload': json.loads(payload),
+                 'version': version, 'attempts': attempts}
+                for job_id, kind, key, payload, version, attempts in cursor.fetchall()
+            ]
+        return jobs
+
+    def is_current(self, job):
+        """True se il job è ancora in coda e non è stato sostituito da una versione più recente"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM outbox_jobs WHERE id = ? AND version = ?", (job['id'], job['version']))
+            current = cursor.fetchone() is not None
+        return current
+
+    def complete(self, job):
+        """Rimuove un job completato (se nel frattempo non è stato aggiornato)"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM outbox_jobs WHERE id = ? AND version = ?", (job['id'], job['version']))
+            conn.commit()
+
+    def retry(self, job, error, delay):
+        """Registra un tentativo fallito e rimanda il job di 'delay' secondi"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE outbox_jobs SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            """, (time.time() + delay, error, job['id']))
+            conn.commit()
+
+    def fail(self, job, error):
+        """Sposta il job tra i falliti: resta salvato ma non viene più riprovato
+
+        Se nel frattempo è arrivata una versione più recente il job resta in
+        attesa: il nuovo payload ha diritto ai suoi tentativi.
+        """
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE outbox_jobs SET attempts = attempts + 1, status = 'failed', last_error = ?
+                WHERE id = ? AND version = ?
+            """, (error, job['id'], job['version']))
+            conn.commit()
+
+    def discard(self, kind, key):
+        """Elimina il job di un documento o file (es. documento cancellato)"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM outbox_jobs WHERE kind = ? AND key = ?", (kind, key))
+            conn.commit()
+
+    def clear(self):
+        """Svuota la coda"""
+        with self.pool.connect() as conn:
+            conn.execute("DELETE FROM outbox_jobs")
+            conn.commit()
+
+    def stats(self):
+        """Job in attesa e falliti, secondi al prossimo tentativo e ultimo errore"""
+        with self.pool.connect() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute("""
+                SELECT COUNT(*), MIN(next_attempt_at), MAX(attempts) FROM outbox_jobs WHERE status = 'pending'
+            """)
+            pending, next_attempt_at, max_attempts = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM outbox_jobs WHERE status = 'failed'")
+            failed = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT last_error FROM outbox_jobs WHERE last_error IS NOT NULL
+                ORDER BY next_attempt_at DESC LIMIT 1
+            """)
+            row = cursor.fetchone()
+
+        return {
+            'pending': pending,
+            'failed': failed,
+            'next_attempt_in': max(0.0, next_attempt_at - time.time()) if next_attempt_at else None,
+            'max_attempts': max_attempts or 0,
+            'last_error': row[0] if row else None
+        }
+
+class OutboxWorker:
+    def __init__(self, rag_system, base_delay=5.0, max_delay=600.0, poll_interval=5.0, batch_size=20,
+                 max_attempts=20):
+        self.rag_system = rag_system
+        self.outbox = rag_system.outbox
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Tentativi falliti dopo i quali un job è abbandonato (stato 'failed')
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.processed = 0
+        self.last_event = None
+        self.last_error = None
+
+    @property
+    def breaker(self):
+        """Circuit breaker del servizio remoto (None se l'agente non ne ha uno)"""
+        return getattr(self.rag_system.remote_agent, "breaker", None)
+
+    def start(self):
+        """Avvia il worker in un thread daemon"""
+        if self._thread and self._thread.is_alive():
+            return "⚠️ Worker outbox già attivo"
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+        return f"📮 Worker outbox avviato ({self.outbox.stats()['pending']} job in coda)"
+
+    def stop(self):
+        """Arresta il worker (i job restano salvati)"""
+        self._stop.set()
+        self.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self):
+        """Sveglia il worker (es. dopo l'aggiunta di un job)"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def _wait(self, timeout):
+        with self._condition:
+            if not self._stop.is_set():
+                self._condition.wait(timeout=timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Circuito aperto: nessun tentativo finché non è prevista la prova
+            breaker = self.breaker
+            if breaker and breaker.is_open:
+                self._wait(breaker.retry_after())
+                continue
+
+            jobs = self.outbox.due(self.batch_size)
+            if not jobs:
+                next_attempt_in = self.outbox.stats()['next_attempt_in']
+                self._wait(min(self.poll_interval, next_attempt_in) if next_attempt_in is not None
+                           else self.poll_interval)
+                continue
+
+            for job in jobs:
+                if self._stop.is_set() or (breaker and breaker.is_open):
+                    break
+                self._process(job)
+
+    def _process(self, job):
+        """Riesegue un job; in caso di errore lo rimanda con backoff esponenziale
+
+        Oltre max_attempts il job è spostato tra i falliti, ma solo se il
+        servizio remoto è disponibile: i fallimenti durante un'interruzione
+        (circuito aperto) non rendono definitivo l'errore.
+        """
+        try:
+            done = self.rag_system.retry_job(job)
+            error = None if done else "servizio embedding non disponibile"
+        except Exception as e:
+            done, error = False, str(e)
+
+        if done:
+            self.outbox.complete(job)
+            self.processed += 1
+            self.last_event = f"{job['kind']} '{job['key']}' indicizzato dopo {job['attempts'] + 1} tentativi"
+            return
+
+        breaker = self.breaker
+        if job['attempts'] + 1 >= self.max_attempts and not (breaker and breaker.is_open):
+            self.outbox.fail(job, error)
+            self.last_error = f"{job['kind']} '{job['key']}' abbandonato dopo {job['attempts'] + 1} tentativi: {error}"
+            return
+
+        # Backoff esponenziale con jitter per non riprovare tutti i job insieme
+        delay = min(self.max_delay, self.base_delay * 2 ** min(job['attempts'], 20))
+        delay *= random.uniform(0.8, 1.2)
+        self.outbox.retry(job, error, delay)
+        self.last_error = f"{job['kind']} '{job['key']}': {error}"
+
+    def status(self):
+        """Stato del worker, della coda e del servizio remoto"""
+        stats = self.outbox.stats()
+        running = self._thread is not None and self._thread.is_alive()
+
+        result = f"📮 Outbox: {'attivo' if running else 'fermo'}, {stats['pending']} job in coda\n"
+        if stats['failed']:
+            result += f"• Job falliti (abbandonati dopo {self.max_attempts} tentativi): {stats['failed']}\n"
+        if stats['next_attempt_in'] is not None:
+            result += (f"• Prossimo tentativo tra {int(stats['next_attempt_in'])}s "
+                       f"(massimo {stats['max_attempts']} tentativi falliti)\n")
+        if self.breaker:
+            result += f"• Servizio remoto: {self.breaker.status()}\n"
+        result += f"• Job completati: {self.processed}"
+        if self.last_event:
+            result += f"\n• Ultimo completato: {self.last_event}"
+        if self.last_error or stats['last_error']:
+            result += f"\n• Ultimo errore: {self.last_error or stats['last_error']}"
+        return result
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Pomodoro Scheduler - Timer Pomodoro non bloccanti
+
+Un unico thread gestisce tutti i timer attivi tramite una coda a priorità
+ordinata per scadenza: alla fine del focus la sessione viene completata
+(minuti sommati al task), poi parte la pausa e, se previsto, il ciclo
+successivo. Lo stato è salvato nella tabella pomodoro_timers e viene
+ripreso al riavvio. Se il passaggio di fase fallisce (es. database
+bloccato) il timer resta nella fase corrente e viene riprovato dopo
+retry_seconds. Lo scheduler è condiviso da tutti gli utenti: ogni
+timer registra il proprio user_id e le sessioni vengono scritte tramite la
+vista DatabaseManager.for_user corrispondente.
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+class PomodoroScheduler:
+    def __init__(self, db_manager, focus_minutes=25, short_break_minutes=5,
+                 long_break_minutes=15, long_break_every=4, notify=print, retry_seconds=30):
+        self.db_manager = db_manager
+        self.focus_minutes = focus_minutes
+        self.short_break_minutes = short_break_minutes
+        self.long_break_minutes = long_break_minutes
+        self.long_break_every = long_break_every
+        self.notify = notify
+        self.retry_seconds = retry_seconds
+
+        self._timers = {}
+        self._heap = []
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Riprende i timer salvati e avvia il thread dello scheduler"""
+        if self._thread and self._thread.is_alive():
+            return "⚠️ Scheduler Pomodoro già attivo"
+
+        with self._condition:
+            for timer in self.db_manager.get_active_pomodoro_timers(all_users=True):
+                self._schedule(timer)
+            resumed = len(self._timers)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pomodoro-scheduler", daemon=True)
+        self._thread.start()
+        return f"⏱️ Scheduler Pomodoro avviato ({resumed} timer ripresi)"
+
+    def stop(self):
+        """Arresta lo scheduler (lo stato resta salvato nel database)"""
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _schedule(self, timer, run_at=None):
+        """Registra il timer e inserisce la sua scadenza nella coda
+
+        Le voci della coda sono (esecuzione, id, scadenza della fase): la
+        scadenza identifica la fase, l'esecuzione può essere rimandata.
+        """
+        self._timers[timer['id']] = timer
+        heapq.heappush(self._heap, (run_at or timer['phase_ends_at'], timer['id'], timer['phase_ends_at']))
+        self._condition.notify()
+
+    def _db(self, timer):
+        """Vista del database dell'utente proprietario del timer"""
+        return self.db_manager.for_user(timer['user_id'])
+
+    def _owned(self, timer, user_id):
+        """True se il timer appartiene all'utente (None: utente di default dello scheduler)"""
+        return timer['user_id'] == (user_id or self.db_manager.user_id)
+
+    def start_pomodoro(self, task_id=None, cycles=1, user_id=None):
+        """Avvia un timer di uno o più cicli focus + pausa"""
+        now = datetime.now()
+        db = self.db_manager.for_user(user_id or self.db_manager.user_id)
+        # Il task deve appartenere all'utente
+        if task_id is not None and not db.has_task(task_id):
+            return f"❌ Task {task_id} non trovato"
+        session_id = db.create_pomodoro_session(task_id, self.focus_minutes, now)
+        timer = {
+            'user_id': db.user_id,
+            'task_id': task_id,
+            'session_id': session_id,
+            'phase': 'focus',
+            'current_cycle': 1,
+            'total_cycles': cycles,
+            'phase_ends_at': now + timedelta(minutes=self.focus_minutes)
+        }
+        timer['id'] = db.save_pomodoro_timer(timer)
+
+        with self._condition:
+            self._schedule(timer)
+
+        return (f"🍅 Pomodoro avviato (timer {timer['id']}, sessione {session_id}) - "
+                f"Focus per {self.focus_minutes} minuti, {cycles} cicli. Completamento automatico.")
+
+    def cancel(self, timer_id, user_id=None):
+        """Interrompe un timer; il focus in corso viene registrato per il tempo svolto"""
+        with self._condition:
+            timer = self._timers.get(timer_id)
+            if not timer or not self._owned(timer, user_id):
+                return f"❌ Timer Pomodoro {timer_id} non attivo"
+            self._timers.pop(timer_id)
+
+        db = self._db(timer)
+        if timer['phase'] == 'focus':
+            db.complete_pomodoro(timer['session_id'], notes="Interrotto")
+        timer['phase'] = 'cancelled'
+        db.save_pomodoro_timer(timer)
+        return f"⏹️ Timer Pomodoro {timer_id} interrotto"
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._condition:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                run_at, timer_id, due = self._heap[0]
+                wait = (run_at - datetime.now()).total_seconds()
+                if wait > 0:
+                    self._condition.wait(timeout=wait)
+                    continue
+
+                heapq.heappop(self._heap)
+                timer = self._timers.get(timer_id)
+                # Voci obsolete (timer annullati o già riprogrammati)
+                if timer is None or timer['phase_ends_at'] != due:
+                    continue
+
+            try:
+                self._advance(timer)
+            except Exception as e:
+                # La fase resta invariata: nuovo tentativo più tardi
+                with self._condition:
+                    if self._timers.get(timer_id) is timer:
+                        self._schedule(timer, datetime.now() + timedelta(seconds=self.retry_seconds))
+                if self.notify:
+                    self.notify(f"⚠️ Errore timer Pomodoro {timer_id}: {e} "
+                                f"(nuovo tentativo tra {self.retry_seconds}s)")
+
+    def _advance(self, timer):
+        """Passa il timer alla fase successiva
+
+        Lavora su una copia: il timer registrato cambia solo a passaggio
+        riuscito, così un errore lascia la fase com'era.
+        """
+        timer = dict(timer)
+        now = datetime.now()
+        due = timer['phase_ends_at']
+        db = self._db(timer)
+
+        if timer['phase'] == 'focus':
+            # Dopo un riavvio il focus scaduto viene chiuso all'orario previsto
+            db.complete_pomodoro(timer['session_id'], end_time=min(now, due))
+
+            if timer['current_cycle'] >= timer['total_cycles']:
+                timer['phase'] = 'done'
+                message = f"🔔 Pomodoro completato (timer {timer['id']})! Ottimo lavoro."
+            else:
+                long_break = timer['current_cycle'] % self.long_break_every == 0
+                minutes = self.long_break_minutes if long_break else self.short_break_minutes
+                timer['phase'] = 'break'
+                timer['phase_ends_at'] = max(now, due) + timedelta(minutes=minutes)
+                message = f"🔔 Focus completato (timer {timer['id']}) - Pausa di {minutes} minuti"
+        else:
+            # Il nuovo focus parte da adesso, anche se la pausa è scaduta da tempo
+            timer['current_cycle'] += 1
+            timer['session_id'] = db.create_pomodoro_session(timer['task_id'], self.focus_minutes, now)
+            timer['phase'] = 'focus'
+            timer['phase_ends_at'] = now + timedelta(minutes=self.focus_minutes)
+            message = (f"🔔 Pausa finita (timer {timer['id']}) - Ciclo {timer['current_cycle']}/"
+                       f"{timer['total_cycles']}, focus per {self.focus_minutes} minuti")
+
+        with self._condition:
+            # Timer annullato durante l'elaborazione: lo stato resta quello di cancel()
+            if timer['id'] not in self._timers:
+                return
+            db.save_pomodoro_timer(timer)
+            if timer['phase'] == 'done':
+                self._timers.pop(timer['id'], None)
+            else:
+                self._schedule(timer)
+
+        if self.notify:
+            self.notify(message)
+
+    def status(self, user_id=None):
+        """Elenco dei timer attivi con il tempo rimanente"""
+        with self._condition:
+            timers = sorted((timer for timer in self._timers.values() if self._owned(timer, user_id)),
+                            key=lambda timer: timer['phase_ends_at'])
+
+        if not timers:
+            return "⏱️ Nessun timer Pomodoro attivo"
+
+        now = datetime.now()
+        result = "⏱️ Timer Pomodoro attivi:\n"
+        for timer in timers:
+            remaining = max(0, int((timer['phase_ends_at'] - now).total_seconds()))
+            phase = "Focus" if timer['phase'] == 'focus' else "Pausa"
+            task = f", task {timer['task_id']}" if timer['task_id'] is not None else ""
+            result += (f"• Timer {timer['id']}{task}: {phase} ciclo {timer['current_cycle']}/"
+                       f"{timer['total_cycles']} - {remaining // 60}:{remaining % 60:02d} rimanenti\n")
+        return result
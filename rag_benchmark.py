@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Benchmark - Confronto recall vs latenza per i parametri HNSW di ChromaDB
+
+Uso:
+    python rag_benchmark.py --n 100000 --dim 768 --queries 200
+
+Genera vettori sintetici, calcola i vicini esatti con NumPy e misura
+per ogni combinazione (M, ef_construction, ef_search) la recall@k e la
+latenza media per query delle collection Chroma.
+"""
+
+import argparse
+import itertools
+import time
+import numpy as np
+import chromadb
+
+def exact_top_k(data, queries, k, space):
+    """Calcola i k vicini esatti (ground truth) con NumPy"""
+    if space == "cosine":
+        data = data / np.linalg.norm(data, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = -(queries @ data.T)
+    elif space == "ip":
+        scores = -(queries @ data.T)
+    else:
+        scores = (
+            (queries ** 2).sum(axis=1)[:, None]
+            - 2 * queries @ data.T
+            + (data ** 2).sum(axis=1)[None, :]
+        )
+    top = np.argpartition(scores, k, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+def build_collection(client, data, space, m, construction_ef, batch_size=5000):
+    """Crea e popola una collection con la configurazione HNSW indicata"""
+    name = f"bench_{space}_{m}_{construction_ef}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    
+    collection = client.create_collection(name, metadata={
+        "hnsw:space": space,
+        "hnsw:M": m,
+        "hnsw:construction_ef": construction_ef,
+    })
+    
+    start = time.perf_counter()
+    for i in range(0, len(data), batch_size):
+        batch = data[i:i + batch_size]
+        collection.add(
+            ids=[str(j) for j in range(i, i + len(batch))],
+            embeddings=batch.tolist()
+        )
+    return collection, time.perf_counter() - start
+
+def run_benchmark(n, dim, n_queries, k, space, m_values, construction_values, search_values, seed=42):
+    """Esegue il benchmark e restituisce una lista di risultati"""
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((n, dim), dtype=np.float32)
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    truth = exact_top_k(data, queries, k, space)
+    
+    client = chromadb.EphemeralClient()
+    results = []
+    
+    for m, construction_ef in itertools.product(m_values, construction_values):
+        collection, build_time = build_collection(client, data, space, m, construction_ef)
+        
+        for search_ef in search_values:
+            collection.modify(metadata={"hnsw:search_ef": search_ef})
+            
+            hits = 0
+            start = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                found = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+                hits += len(expected & {int(doc_id) for doc_id in found['ids'][0]})
+            latency_ms = (time.perf_counter() - start) * 1000 / n_queries
+            
+            results.append({
+                "M": m,
+                "ef_construction": construction_ef,
+                "ef_search": search_ef,
+                "build_s": build_time,
+                "recall": hits / (k * n_queries),
+                "latency_ms": latency_ms
+            })
+    
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall/latenza HNSW per RAGSystem")
+    parser.add_argument("--n", type=int, default=20000, help="Numero di vettori")
+    parser.add_argument("--dim", type=int, default=768, help="Dimensione embedding")
+    parser.add_argument("--queries", type=int, default=100, help="Numero di query")
+    parser.add_argument("-k", type=int, default=10, help="Vicini per query")
+    parser.add_argument("--space", default="cosine", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 50, 100, 200])
+    args = parser.parse_args()
+    
+    print(f"📊 Benchmark HNSW: {args.n} vettori x {args.dim}, {args.queries} query, k={args.k}, space={args.space}")
+    results = run_benchmark(
+        args.n, args.dim, args.queries, args.k, args.space,
+        args.m, args.ef_construction, args.ef_search
+    )
+    
+    print(f"{'M':>4} {'ef_c':>6} {'ef_s':>6} {'build(s)':>9} {'recall':>8} {'ms/query':>9}")
+    for row in results:
+        print(f"{row['M']:>4} {row['ef_construction']:>6} {row['ef_search']:>6} "
+              f"{row['build_s']:>9.1f} {row['recall']:>8.3f} {row['latency_ms']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
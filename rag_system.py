@@ -1,40 +1,372 @@
 # -*- coding: utf-8 -*-
 """
-RAG System - Sistema di Retrieval-Augmented Generation usando ChromaDB
+RAG System - Sistema di Retrieval-Augmented Generation usando ChromaDB o NumPy
 """
 
+import math
 import os
-import chromadb
-from chromadb.config import Settings
-from remote_agent import RemoteAgent
+import re
+import threading
+from datetime import date, datetime
+from vector_store import ChromaVectorStore, NumpyVectorStore
+from outbox import Outbox
+from database_manager import DEFAULT_USER_ID
+from ingestion import (DEFAULT_CHUNK_CHARS, SimhashIndex, file_hash, get_extractor,
+                       iter_parse_files, parse_file)
+
+# Chunk per richiesta di embedding: ogni lotto viene salvato appena calcolato
+EMBED_BATCH_SIZE = 100
+
+# Campi metadata su cui è possibile filtrare le ricerche
+FILTER_FIELDS = ("source", "topic", "language", "date")
+
+def date_value(value):
+    """Data come intero AAAAMMGG, confrontabile con $gt/$lt anche in Chroma"""
+    if value is None or isinstance(value, int):
+        return value
+    if not isinstance(value, date):
+        try:
+            value = date.fromisoformat(str(value).strip())
+        except ValueError:
+            raise ValueError(f"Data non valida: {value} (formato AAAA-MM-GG)")
+    return value.year * 10000 + value.month * 100 + value.day
 
 class RAGSystem:
-    def __init__(self, persist_directory="./timemind_chroma"):
-        self.persist_directory = persist_directory
-        self.chroma_client = chromadb.PersistentClient(path=persist_directory)
-        self.knowledge_collection = self.chroma_client.get_or_create_collection("knowledge_base")
+    def __init__(self, persist_directory=None, backend=None, hnsw_space=None,
+                 hnsw_m=None, hnsw_construction_ef=None, hnsw_search_ef=None,
+                 quantization=None, embedding_dimensions=None, kb_path="./knowledge_base",
+                 chunk_chars=DEFAULT_CHUNK_CHARS, ingest_workers=None, remote_agent=None,
+                 outbox_path=None, data_dir="."):
+        self.kb_path = kb_path
+        
+        # Pipeline di ingestione: dimensione chunk e processi per il parsing
+        self.chunk_chars = chunk_chars
+        self.ingest_workers = ingest_workers
+        
+        # Serializza l'accesso al vector store (usato anche dal watcher in background)
+        self._lock = threading.RLock()
+        
+        # Backend vettoriale: "chroma" (default) oppure "numpy"; vettori e outbox
+        # stanno in data_dir se non sono indicati percorsi espliciti
+        self.backend = backend or os.getenv("TIMEMIND_VECTOR_BACKEND", "chroma")
+        
+        # Quantizzazione dei vettori (solo backend numpy): "int8" o "binary"
+        quantization = quantization or os.getenv("TIMEMIND_VECTOR_QUANTIZATION") or None
+        
+        # Troncamento Matryoshka degli embedding (es. 768 invece di 3072)
+        dimensions = embedding_dimensions or os.getenv("TIMEMIND_EMBEDDING_DIMENSIONS")
+        self.embedding_dimensions = int(dimensions) if dimensions else None
+        
+        if self.backend == "numpy":
+            self.persist_directory = persist_directory or os.path.join(data_dir, "timemind_vectors")
+            self.vector_store = NumpyVectorStore(self.persist_directory, quantization=quantization)
+        elif quantization:
+            raise ValueError("La quantizzazione è supportata solo dal backend numpy")
+        elif self.backend == "chroma":
+            self.persist_directory = persist_directory or os.path.join(data_dir, "timemind_chroma")
+            # Parametri HNSW registrati come metadata della collection
+            # (space, M e construction_ef sono fissati alla creazione)
+            self.vector_store = ChromaVectorStore(self.persist_directory, hnsw_config={
+                "hnsw:space": hnsw_space or os.getenv("TIMEMIND_HNSW_SPACE", "l2"),
+                "hnsw:M": hnsw_m or int(os.getenv("TIMEMIND_HNSW_M", 16)),
+                "hnsw:construction_ef": hnsw_construction_ef or int(os.getenv("TIMEMIND_HNSW_CONSTRUCTION_EF", 100)),
+                "hnsw:search_ef": hnsw_search_ef or int(os.getenv("TIMEMIND_HNSW_SEARCH_EF", 10)),
+            })
+        else:
+            raise ValueError(f"Backend vettoriale non supportato: {self.backend}")
+        
+        # Usa RemoteAgent per generare embedding (condivisibile con TimeMindAgent)
+        if remote_agent is None:
+            from remote_agent import RemoteAgent
+            remote_agent = RemoteAgent()
+        self.remote_agent = remote_agent
         
-        # Usa RemoteAgent per generare embedding
-        self.remote_agent = RemoteAgent()
+        # Documenti e file da indicizzare quando il servizio remoto torna disponibile
+        self.outbox = Outbox(outbox_path or os.path.join(data_dir, "timemind_outbox.db"))
+        
+        # Vettori con una dimensione diversa da quella configurata: store da ricostruire
+        self._check_embedding_dimensions()
         
         # Carica knowledge base se non già fatto
         self.load_knowledge_base()
+        self._migrate_legacy_documents()
         
     def load_knowledge_base(self):
-        """Carica file dalla cartella knowledge_base nel vector DB"""
-        kb_path = "./knowledge_base"
+        """Sincronizza la cartella knowledge_base con il vector DB
+        
+        Vengono indicizzati solo i file nuovi o modificati; i documenti dei
+        file rimossi vengono eliminati. Parsing e chunking dei file avvengono
+        in parallelo e ogni file viene indicizzato appena è pronto.
+        """
+        if not os.path.exists(self.kb_path):
+            os.makedirs(self.kb_path)
+            self._create_sample_files(self.kb_path)
+        
+        indexed = self._load_file_index()
+        present = set()
+        changed = {}
+        
+        for filename in sorted(os.listdir(self.kb_path)):
+            if self.is_knowledge_file(filename):
+                present.add(filename)
+                content_hash = file_hash(os.path.join(self.kb_path, filename))
+                if indexed.get(filename) != content_hash:
+                    changed[filename] = content_hash
+        
+        paths = [os.path.join(self.kb_path, filename) for filename in changed]
+        for path, chunks in iter_parse_files(paths, self.chunk_chars, self.ingest_workers):
+            filename = os.path.basename(path)
+            content_hash = changed[filename]
+            if isinstance(chunks, Exception):
+                print(f"⚠️ Errore lettura '{filename}': {chunks}")
+                continue
+            message = self._index_file(filename, chunks, content_hash)
+            if not message.startswith("✅"):
+                print(message)
+        
+        for filename in set(indexed) - present:
+            self.remove_file(filename)
+    
+    def _check_embedding_dimensions(self):
+        """Reindicizza la knowledge base se la dimensione degli embedding è cambiata
+        
+        La dimensione attesa è embedding_dimensions oppure, se non impostata,
+        quella di un embedding di prova (controllo saltato se il servizio
+        remoto non risponde). I vettori salvati non sono confrontabili con le
+        nuove query: lo store viene svuotato, i file vengono reindicizzati da
+        load_knowledge_base e i documenti aggiunti vengono ricalcolati (o messi
+        nell'outbox se il servizio remoto non risponde).
+        """
+        with self._lock:
+            stored = self.vector_store.dimensions()
+        if stored is None:
+            return
+        
+        expected = self.embedding_dimensions
+        if expected is None:
+            probe = self._embed("dimensione", "RETRIEVAL_QUERY")
+            if not probe:
+                return
+            expected = len(probe)
+        if expected == stored:
+            return
+        
+        with self._lock:
+            results = self.vector_store.get(include_documents=True)
+        documents = [
+            (doc_id, text, metadata or {})
+            for doc_id, text, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            if (metadata or {}).get("origin") != "file"
+        ]
+        embeddings = self._embed_batch([text for _, text, _ in documents], "RETRIEVAL_DOCUMENT") if documents else []
         
-        if not os.path.exists(kb_path):
-            os.makedirs(kb_path)
-            self._create_sample_files(kb_path)
+        with self._lock:
+            self.vector_store.reset()
+            if embeddings:
+                self.vector_store.upsert(
+                    ids=[doc_id for doc_id, _, _ in documents],
+                    embeddings=embeddings,
+                    documents=[text for _, text, _ in documents],
+                    metadatas=[metadata for _, _, metadata in documents]
+                )
+            elif documents:
+                for doc_id, text, metadata in documents:
+                    self.outbox.enqueue("document", doc_id, {"text": text, "metadata": metadata})
+        
+        queued = f", {len(documents)} documenti in coda" if documents and not embeddings else ""
+        print(f"⚠️ Dimensione embedding cambiata ({stored} → {expected}): knowledge base reindicizzata{queued}")
+    
+    def _migrate_legacy_documents(self):
+        """Assegna all'utente di default i documenti salvati prima del multi-tenant
         
-        # Carica tutti i file .txt nella knowledge base
-        for filename in os.listdir(kb_path):
-            if filename.endswith('.txt'):
-                file_path = os.path.join(kb_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    self.add_document(content, filename)
+        Erano senza 'tenant' e con l'id non prefissato: vengono reinseriti con
+        lo stesso embedding, senza richiamare il servizio remoto.
+        """
+        with self._lock:
+            stored = self.vector_store.get()
+            legacy = [
+                doc_id for doc_id, metadata in zip(stored['ids'], stored['metadatas'])
+                if (metadata or {}).get("origin") != "file" and "tenant" not in (metadata or {})
+            ]
+            if not legacy:
+                return
+            
+            results = self.vector_store.get(ids=legacy, include_documents=True, include_embeddings=True)
+            self.vector_store.upsert(
+                ids=[self._tenant_doc_id(doc_id, DEFAULT_USER_ID) for doc_id in results['ids']],
+                embeddings=results['embeddings'],
+                documents=results['documents'],
+                metadatas=[{**(metadata or {}), "tenant": DEFAULT_USER_ID} for metadata in results['metadatas']]
+            )
+            self.vector_store.delete(ids=results['ids'])
+    
+    def is_knowledge_file(self, filename):
+        """Indica se un file della cartella va indicizzato"""
+        return not filename.startswith('.') and get_extractor(filename) is not None
+    
+    def _load_file_index(self):
+        """Legge i chunk dei file indicizzati: mappa file -> hash del contenuto"""
+        with self._lock:
+            results = self.vector_store.get(where={"origin": "file"})
+        
+        chunks = {}
+        for doc_id, metadata in zip(results['ids'], results['metadatas']):
+            metadata = metadata or {}
+            chunks.setdefault(metadata.get("file", doc_id), []).append(metadata)
+        return {filename: self._indexed_hash(metadatas) for filename, metadatas in chunks.items()}
+    
+    @staticmethod
+    def _indexed_hash(metadatas):
+        """Hash del contenuto di un file indicizzato per intero (None se da reindicizzare)
+        
+        Un file è incompleto se l'indicizzazione si è fermata a metà (chunk
+        con hash diversi o meno chunk di quelli attesi) oppure se le date sono
+        salvate come stringa ISO (versioni precedenti).
+        """
+        hashes = {metadata.get("content_hash") for metadata in metadatas}
+        if len(hashes) != 1 or not all(isinstance(metadata.get("date"), int) for metadata in metadatas):
+            return None
+        total = metadatas[0].get("chunks")
+        if total is not None and total != len(metadatas):
+            return None
+        return hashes.pop()
+    
+    def _file_chunk_ids(self, filename):
+        """Id dei chunk indicizzati per un file (incluso l'id del vecchio formato)"""
+        with self._lock:
+            results = self.vector_store.get(where={"file": filename})
+            legacy = self.vector_store.get(ids=[filename])
+        return results['ids'] + legacy['ids']
+    
+    def sync_file(self, filename):
+        """Indicizza un file della knowledge base se nuovo o modificato
+        
+        Restituisce un messaggio di esito, oppure None se il file è invariato.
+        """
+        file_path = os.path.join(self.kb_path, filename)
+        content_hash = file_hash(file_path)
+        
+        with self._lock:
+            results = self.vector_store.get(where={"file": filename})
+        if results['metadatas'] and self._indexed_hash(results['metadatas']) == content_hash:
+            return None
+        
+        return self._index_file(filename, parse_file(file_path, self.chunk_chars), content_hash)
+    
+    def _index_file(self, filename, chunks, content_hash):
+        """Deduplica, calcola gli embedding e sostituisce i chunk di un file
+        
+        Gli embedding sono calcolati e salvati a lotti di EMBED_BATCH_SIZE: se
+        un lotto fallisce i precedenti restano salvati e il nuovo tentativo
+        (dall'outbox) riparte dai chunk mancanti.
+        """
+        file_path = os.path.join(self.kb_path, filename)
+        with self._lock:
+            existing = self.vector_store.get(where={"file": filename})
+            legacy = self.vector_store.get(ids=[filename])
+        old_ids = set(existing['ids'] + legacy['ids'])
+        
+        # Scarta i passaggi quasi identici all'interno del file. Tra file diversi
+        # i duplicati restano: eliminando un file l'altro deve restare completo
+        simhash_index = SimhashIndex()
+        kept = []
+        for text, text_hash in chunks:
+            if simhash_index.find(text_hash) is not None:
+                continue
+            simhash_index.add(len(kept), text_hash)
+            kept.append((text, text_hash))
+        skipped = len(chunks) - len(kept)
+        
+        base_metadata = {
+            "source": "knowledge_base",
+            "origin": "file",
+            "file": filename,
+            "format": os.path.splitext(filename)[1].lower().lstrip('.'),
+            "content_hash": content_hash,
+            "chunks": len(kept),
+            "topic": os.path.splitext(filename)[0],
+            "language": "it",
+            "date": date_value(datetime.fromtimestamp(os.path.getmtime(file_path)).date())
+        }
+        ids = [f"{filename}#{i}" for i in range(len(kept))]
+        metadatas = [
+            {**base_metadata, "chunk": i, "simhash": format(text_hash, "016x")}
+            for i, (_, text_hash) in enumerate(kept)
+        ]
+        
+        # Chunk già salvati da un tentativo precedente sullo stesso contenuto
+        stored = {
+            doc_id: (metadata.get("content_hash"), metadata.get("simhash"), metadata.get("chunks"))
+            for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+        }
+        pending = [
+            i for i in range(len(kept))
+            if stored.get(ids[i]) != (content_hash, metadatas[i]["simhash"], len(kept))
+        ]
+        
+        for start in range(0, len(pending), EMBED_BATCH_SIZE):
+            batch = pending[start:start + EMBED_BATCH_SIZE]
+            embeddings = self._embed_batch([kept[i][0] for i in batch], "RETRIEVAL_DOCUMENT")
+            if embeddings is None:
+                # I chunk salvati restano ricercabili, il resto viene ripreso dall'outbox
+                self.outbox.enqueue("file", filename, {"content_hash": content_hash})
+                done = len(kept) - len(pending) + start
+                return (f"⏳ Embedding non disponibili: file '{filename}' indicizzato in parte "
+                        f"({done}/{len(kept)} chunk), il resto è in coda")
+            with self._lock:
+                self.vector_store.upsert(
+                    ids=[ids[i] for i in batch],
+                    embeddings=embeddings,
+                    documents=[kept[i][0] for i in batch],
+                    metadatas=[metadatas[i] for i in batch]
+                )
+        
+        with self._lock:
+            stale = list(old_ids - set(ids))
+            if stale:
+                self.vector_store.delete(ids=stale)
+            self.outbox.discard("file", filename)
+        
+        return f"✅ File '{filename}' indicizzato: {len(kept)} chunk ({skipped} duplicati scartati)"
+    
+    def remove_file(self, filename):
+        """Rimuove dal vector DB i chunk di un file eliminato"""
+        ids = self._file_chunk_ids(filename)
+        with self._lock:
+            if ids:
+                self.vector_store.delete(ids=ids)
+            self.outbox.discard("file", filename)
+        return f"✅ File '{filename}' rimosso dalla knowledge base ({len(ids)} chunk)"
+    
+    def _build_where(self, where, date_from=None, date_to=None):
+        """Converte un dizionario di filtri nel formato 'where' di Chroma
+        
+        date_from / date_to: intervallo di date (estremi inclusi)
+        """
+        where = where or {}
+        
+        if any(key.startswith("$") for key in where):
+            # Filtri già in sintassi Chroma ($and, $or, ...) passano invariati
+            conditions = [where]
+        else:
+            unknown = [key for key in where if key not in FILTER_FIELDS and key != "doc_id"]
+            if unknown:
+                raise ValueError(f"Filtri non supportati: {', '.join(unknown)}")
+            conditions = [
+                {key: date_value(value) if key == "date" else value}
+                for key, value in where.items() if value is not None
+            ]
+        
+        if date_from is not None:
+            conditions.append({"date": {"$gte": date_value(date_from)}})
+        if date_to is not None:
+            conditions.append({"date": {"$lte": date_value(date_to)}})
+        
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
     
     def _create_sample_files(self, kb_path):
         """Crea file di esempio nella knowledge base"""
@@ -83,47 +415,137 @@ class RAGSystem:
             Aiuta a concentrarsi su ciò che conta davvero.
             """)
     
-    def add_document(self, text, doc_id, metadata=None):
-        """Aggiunge un documento alla knowledge base"""
+    def _embed(self, text, task_type):
+        """Genera l'embedding, troncato alla dimensione configurata"""
+        embedding = self.remote_agent.generate_embedding(text, task_type, self.embedding_dimensions)
+        
+        if embedding and self.embedding_dimensions:
+            embedding = self._truncate(embedding)
+        return embedding
+    
+    def _embed_batch(self, texts, task_type):
+        """Embedding di più testi con chiamate batch (None in caso di errore)"""
+        embeddings = self.remote_agent.generate_embeddings(texts, task_type, self.embedding_dimensions)
+        if embeddings is None:
+            return None
+        if self.embedding_dimensions:
+            embeddings = [self._truncate(embedding) for embedding in embeddings]
+        return embeddings
+    
+    def _truncate(self, embedding):
+        """Tronca un embedding Matryoshka alla dimensione configurata e lo rinormalizza
+
+        Se il modello ignora output_dimensionality il taglio avviene qui; in
+        entrambi i casi i vettori troncati non hanno più norma 1.
+        """
+        embedding = list(embedding)[:self.embedding_dimensions]
+        norm = math.sqrt(sum(value * value for value in embedding)) or 1.0
+        return [value / norm for value in embedding]
+    
+    def _tenant_doc_id(self, doc_id, user_id):
+        """Id del documento nel vector store (prefissato dall'utente)"""
+        return f"{user_id or DEFAULT_USER_ID}:{doc_id}"
+    
+    def _tenant_where(self, where_clause, user_id):
+        """Limita la ricerca ai file condivisi e ai documenti dell'utente
+        
+        Senza user_id si usa l'utente di default, mai tutti gli utenti.
+        """
+        tenant = {"$or": [{"origin": "file"}, {"tenant": user_id or DEFAULT_USER_ID}]}
+        if not where_clause:
+            return tenant
+        return {"$and": [where_clause, tenant]}
+    
+    def add_document(self, text, doc_id, metadata=None, user_id=None):
+        """Aggiunge un documento alla knowledge base
+        
+        user_id: il documento è visibile solo alle ricerche dello stesso utente
+        (utente di default se non indicato). Se gli embedding non sono disponibili il documento resta nell'outbox
+        e viene indicizzato in background.
+        """
         try:
+            # Prepara metadata (i valori passati sovrascrivono i default)
+            metadata = {
+                "source": "knowledge_base",
+                "doc_id": doc_id,
+                "date": date_value(date.today()),
+                **(metadata or {})
+            }
+            metadata["tenant"] = user_id or DEFAULT_USER_ID
+            key = self._tenant_doc_id(doc_id, user_id)
+            
             # Genera embedding usando RemoteAgent
-            embedding = self.remote_agent.generate_embedding(text, "RETRIEVAL_DOCUMENT")
+            embedding = self._embed(text, "RETRIEVAL_DOCUMENT")
             
             if embedding:
-                # Prepara metadata
-                if metadata is None:
-                    metadata = {"source": "knowledge_base", "doc_id": doc_id}
-                
-                # Memorizza nel vector DB
-                self.knowledge_collection.upsert(
-                    embeddings=[embedding],
-                    documents=[text],
-                    ids=[doc_id],
-                    metadatas=[metadata]
-                )
+                # Memorizza nel vector DB (una versione in coda più vecchia non serve più)
+                with self._lock:
+                    self._store_document(key, text, metadata, embedding)
+                    self.outbox.discard("document", key)
                 
                 return f"✅ Documento '{doc_id}' aggiunto alla knowledge base"
             else:
-                return f"❌ Errore generazione embedding per '{doc_id}'"
+                self.outbox.enqueue("document", key, {"text": text, "metadata": metadata})
+                return f"⏳ Embedding non disponibili: documento '{doc_id}' in coda, verrà indicizzato appena possibile"
             
         except Exception as e:
             return f"⚠️ Errore caricamento documento '{doc_id}': {e}"
     
-    def search_documents(self, query, n_results=2):
-        """Cerca documenti rilevanti nella knowledge base"""
+    def _store_document(self, key, text, metadata, embedding):
+        """Salva un documento con il suo embedding nel vector store"""
+        with self._lock:
+            self.vector_store.upsert(
+                ids=[key],
+                embeddings=[embedding],
+                documents=[text],
+                metadatas=[metadata]
+            )
+    
+    def retry_job(self, job):
+        """Riesegue un job dell'outbox; True se completato"""
+        if job['kind'] == "document":
+            embedding = self._embed(job['payload']['text'], "RETRIEVAL_DOCUMENT")
+            if not embedding:
+                return False
+            with self._lock:
+                # Documento eliminato o sostituito nel frattempo: niente da salvare
+                if self.outbox.is_current(job):
+                    self._store_document(job['key'], job['payload']['text'], job['payload']['metadata'], embedding)
+            return True
+        
+        if job['kind'] == "file":
+            if not os.path.exists(os.path.join(self.kb_path, job['key'])):
+                self.remove_file(job['key'])
+                return True
+            message = self.sync_file(job['key'])
+            return message is None or message.startswith("✅")
+        
+        raise ValueError(f"Tipo di job sconosciuto: {job['kind']}")
+    
+    def search_documents(self, query, n_results=2, where=None, user_id=None, date_from=None, date_to=None):
+        """Cerca documenti rilevanti nella knowledge base
+        
+        where: filtri sui metadata, es. {"topic": "deep_work", "language": "it"}
+        user_id: cerca solo nei file condivisi e nei documenti dell'utente (default se non indicato)
+        date_from / date_to: intervallo di date, es. "2024-01-01" (estremi inclusi)
+        """
+        where_clause = self._tenant_where(self._build_where(where, date_from, date_to), user_id)
+        
         try:
             # Genera embedding per la query
-            query_embedding = self.remote_agent.generate_embedding(query, "RETRIEVAL_QUERY")
+            query_embedding = self._embed(query, "RETRIEVAL_QUERY")
             
             if not query_embedding:
-                return None
+                # Embedding non disponibili: ricerca locale per parole chiave
+                return self._keyword_search(query, n_results, where_clause)
             
             # Cerca documenti rilevanti
-            results = self.knowledge_collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                include=['documents', 'distances', 'metadatas']
-            )
+            with self._lock:
+                results = self.vector_store.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=where_clause
+                )
             
             if results['documents'][0]:
                 return {
@@ -137,9 +559,37 @@ class RAGSystem:
             print(f"⚠️ Errore ricerca documenti: {e}")
             return None
     
-    def get_context_for_query(self, query, n_results=2):
-        """Ottiene contesto rilevante per una query"""
-        search_results = self.search_documents(query, n_results)
+    def _keyword_search(self, query, n_results, where_clause):
+        """Ricerca per parole chiave sui testi salvati (senza servizio remoto)"""
+        terms = set(re.findall(r"\w{3,}", query.lower()))
+        if not terms:
+            return None
+        
+        with self._lock:
+            stored = self.vector_store.get(where=where_clause, include_documents=True)
+        
+        # Punteggio: termini distinti trovati, poi frequenza relativa
+        scored = []
+        for document, metadata in zip(stored['documents'], stored['metadatas']):
+            words = re.findall(r"\w{3,}", document.lower())
+            matched = terms.intersection(words)
+            if matched:
+                hits = sum(1 for word in words if word in terms)
+                scored.append((len(matched) + hits / len(words), document, metadata))
+        
+        if not scored:
+            return None
+        scored.sort(key=lambda item: item[0], reverse=True)
+        top = scored[:n_results]
+        return {
+            'documents': [document for _, document, _ in top],
+            'distances': [1 / (1 + score) for score, _, _ in top],
+            'metadatas': [metadata for _, _, metadata in top]
+        }
+    
+    def get_context_for_query(self, query, n_results=2, where=None, user_id=None, date_from=None, date_to=None):
+        """Ottiene contesto rilevante per una query (stessi filtri di search_documents)"""
+        search_results = self.search_documents(query, n_results, where, user_id, date_from, date_to)
         
         if search_results and search_results['documents']:
             return "\n".join(search_results['documents'])
@@ -148,15 +598,20 @@ class RAGSystem:
     def get_collection_stats(self):
         """Restituisce statistiche sulla collection"""
         try:
-            count = self.knowledge_collection.count()
-            return f"📊 Knowledge base: {count} documenti indicizzati"
+            with self._lock:
+                count = self.vector_store.count()
+                description = self.vector_store.describe()
+            return f"📊 Knowledge base: {count} documenti indicizzati ({description})"
         except Exception as e:
             return f"❌ Errore statistiche: {e}"
     
-    def delete_document(self, doc_id):
+    def delete_document(self, doc_id, user_id=None):
         """Elimina un documento dalla knowledge base"""
         try:
-            self.knowledge_collection.delete(ids=[doc_id])
+            key = self._tenant_doc_id(doc_id, user_id)
+            with self._lock:
+                self.vector_store.delete(ids=[key])
+                self.outbox.discard("document", key)
             return f"✅ Documento '{doc_id}' eliminato dalla knowledge base"
         except Exception as e:
             return f"❌ Errore eliminazione documento '{doc_id}': {e}"
@@ -164,8 +619,9 @@ class RAGSystem:
     def reset_knowledge_base(self):
         """Resetta completamente la knowledge base"""
         try:
-            self.chroma_client.delete_collection("knowledge_base")
-            self.knowledge_collection = self.chroma_client.get_or_create_collection("knowledge_base")
+            with self._lock:
+                self.vector_store.reset()
+                self.outbox.clear()
             return "✅ Knowledge base resettata"
         except Exception as e:
             return f"❌ Errore reset knowledge base: {e}"
\ No newline at end of file
@@ -7,18 +7,24 @@ import os
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from circuit_breaker import CircuitBreaker
 
 load_dotenv()
 
 class RemoteAgent:
-    def __init__(self, model_name="gemini-2.0-flash-001"):
+    def __init__(self, model_name="gemini-2.0-flash-001", timeout=30.0, breaker=None):
         self.model_name = model_name
         self.api_key = os.getenv("GOOGLE_API_KEY")
         
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY non configurata nel file .env")
         
-        self.client = genai.Client(api_key=self.api_key)
+        # Timeout per richiesta (ms per l'SDK): evita attese lunghe durante i disservizi
+        self.client = genai.Client(api_key=self.api_key,
+                                   http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+        
+        # Dopo errori consecutivi le chiamate falliscono subito per un intervallo
+        self.breaker = breaker or CircuitBreaker()
         
     def test_connection(self):
         """Testa la connessione a Gemini"""
@@ -33,16 +39,25 @@ class RemoteAgent:
             print(f"❌ Errore Gemini: {e}")
             return False
     
-    def generate_response(self, prompt, context="", temperature=0.7, max_tokens=1000):
-        """Genera una risposta usando l'agente remoto"""
-        try:
-            full_prompt = f"""Sei TimeMind, un coach avanzato per la produttività.
+    def _build_prompt(self, prompt, context=""):
+        """Prompt completo con il contesto della knowledge base"""
+        return f"""Sei TimeMind, un coach avanzato per la produttività.
             
 {context}
 
 Domanda dell'utente: {prompt}
 
 Fornisci un'analisi approfondita e suggerimenti personalizzati."""
+    
+    def generate_response(self, prompt, context="", temperature=0.7, max_tokens=1000):
+        """Genera una risposta usando l'agente remoto
+        
+        Restituisce None se Gemini non è raggiungibile (o il circuito è aperto).
+        """
+        if not self.breaker.allow():
+            return None
+        try:
+            full_prompt = self._build_prompt(prompt, context)
 
             response = self.client.models.generate_content(
                 model=self.model_name,
@@ -53,23 +68,93 @@ Fornisci un'analisi approfondita e suggerimenti personalizzati."""
                 )
             )
             
+            self.breaker.record_success()
             return response.text
             
         except Exception as e:
-            return f"Errore agente remoto: {e}"
+            self.breaker.record_failure(e)
+            print(f"⚠️ Errore agente remoto: {e}")
+            return None
     
-    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT"):
-        """Genera embedding per il testo usando Gemini"""
+    def generate_response_stream(self, prompt, context="", temperature=0.7, max_tokens=1000):
+        """Genera la risposta a frammenti man mano che Gemini la produce
+        
+        Se Gemini non è raggiungibile non produce alcun frammento.
+        """
+        if not self.breaker.allow():
+            return
+        received = False
+        try:
+            stream = self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=self._build_prompt(prompt, context),
+                config=types.GenerateContentConfig(
+                    temperature=temperature, 
+                    max_output_tokens=max_tokens
+                )
+            )
+            
+            for chunk in stream:
+                if chunk.text:
+                    received = True
+                    yield chunk.text
+            self.breaker.record_success()
+            
+        except Exception as e:
+            self.breaker.record_failure(e)
+            print(f"⚠️ Errore agente remoto: {e}")
+            # Risposta interrotta a metà: lo segnala invece di troncarla in silenzio
+            if received:
+                yield f"\n[Risposta interrotta: {e}]"
+    
+    def generate_embedding(self, text, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=None):
+        """Genera embedding per il testo usando Gemini
+        
+        output_dimensionality: dimensione ridotta (Matryoshka) supportata dal modello
+        """
+        if not self.breaker.allow():
+            return None
         try:
             result = self.client.models.embed_content(
                 model="gemini-embedding-exp-03-07",
                 contents=text,
-                config=types.EmbedContentConfig(task_type=task_type)
+                config=types.EmbedContentConfig(
+                    task_type=task_type,
+                    output_dimensionality=output_dimensionality
+                )
             )
             
+            self.breaker.record_success()
             return result.embeddings[0].values
             
         except Exception as e:
+            self.breaker.record_failure(e)
+            print(f"⚠️ Errore generazione embedding: {e}")
+            return None
+    
+    def generate_embeddings(self, texts, task_type="RETRIEVAL_DOCUMENT", output_dimensionality=None,
+                            batch_size=100):
+        """Genera embedding per più testi con richieste batch"""
+        if not self.breaker.allow():
+            return None
+        embeddings = []
+        try:
+            for start in range(0, len(texts), batch_size):
+                result = self.client.models.embed_content(
+                    model="gemini-embedding-exp-03-07",
+                    contents=texts[start:start + batch_size],
+                    config=types.EmbedContentConfig(
+                        task_type=task_type,
+                        output_dimensionality=output_dimensionality
+                    )
+                )
+                embeddings.extend(embedding.values for embedding in result.embeddings)
+            
+            self.breaker.record_success()
+            return embeddings
+            
+        except Exception as e:
+            self.breaker.record_failure(e)
             print(f"⚠️ Errore generazione embedding: {e}")
             return None
     
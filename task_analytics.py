@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Task Analytics - Accuratezza delle stime, tempi di ciclo e throughput
+
+Le colonne di tasks e pomodoro_sessions vengono lette una sola volta in
+array NumPy e aggregate in modo vettoriale. Il risultato è disponibile come
+report testuale e come contesto compatto per le analisi di RemoteAgent.
+"""
+
+import time
+import numpy as np
+
+# Percentili riportati per le distribuzioni
+PERCENTILES = (10, 50, 90)
+
+# Soglie del rapporto effettivo/stimato per l'istogramma degli errori
+RATIO_BUCKETS = (0.5, 0.8, 1.2, 1.5, 2.0)
+
+class TaskAnalytics:
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+
+    def _load(self):
+        """Carica le colonne come array (NaN per i valori mancanti)"""
+        tasks, sessions = self.db_manager.load_task_data()
+
+        columns = np.array(
+            [(task_id, priority, created, completed, estimated, actual)
+             for task_id, priority, _, created, completed, estimated, actual in tasks],
+            dtype=float
+        ).reshape(-1, 6)
+        status = np.array([row[2] for row in tasks], dtype=object)
+        pomodoros = np.array(sessions, dtype=float).reshape(-1, 3)
+
+        return {
+            'id': columns[:, 0], 'priority': columns[:, 1],
+            'created': columns[:, 2], 'completed': columns[:, 3],
+            'estimated': columns[:, 4], 'actual': columns[:, 5],
+            'done': status == 'completed',
+            'session_task': pomodoros[:, 0], 'session_done': pomodoros[:, 1] == 1,
+            'session_minutes': pomodoros[:, 2]
+        }
+
+    def compute(self, days=30):
+        """Calcola tutte le metriche; days è la finestra del throughput"""
+        if days < 1:
+            raise ValueError(f"Finestra non valida: {days} giorni (minimo 1)")
+        data = self._load()
+        return {
+            'tasks': int(len(data['id'])),
+            'completed': int(data['done'].sum()),
+            'estimation': self._estimation(data),
+            'cycle_time': self._cycle_time(data),
+            'throughput': self._throughput(data, days),
+            'pomodoros': self._pomodoros(data)
+        }
+
+    @staticmethod
+    def _estimation(data):
+        """Distribuzione dell'errore di stima sui task completati"""
+        valid = data['done'] & (data['estimated'] > 0) & ~np.isnan(data['actual'])
+        if not valid.any():
+            return None
+
+        estimated, actual = data['estimated'][valid], data['actual'][valid]
+        ratio = actual / estimated
+        error = actual - estimated
+        buckets = np.bincount(np.digitize(ratio, RATIO_BUCKETS), minlength=len(RATIO_BUCKETS) + 1)
+
+        return {
+            'samples': int(valid.sum()),
+            'ratio_percentiles': dict(zip(PERCENTILES, np.percentile(ratio, PERCENTILES).round(2).tolist())),
+            'error_minutes_percentiles': dict(zip(PERCENTILES, np.percentile(error, PERCENTILES).round(1).tolist())),
+            'mean_abs_pct_error': float(np.mean(np.abs(error) / estimated)),
+            'underestimated_share': float(np.mean(ratio > 1)),
+            'ratio_histogram': buckets.tolist()
+        }
+
+    @staticmethod
+    def _cycle_time(data):
+        """Tempo di ciclo (ore dalla creazione al completamento) per priorità"""
+        valid = data['done'] & ~np.isnan(data['created']) & ~np.isnan(data['completed'])
+        if not valid.any():
+            return {}
+
+        hours = (data['completed'][valid] - data['created'][valid]) / 3600
+        priorities = data['priority'][valid]
+
+        # Ordina per priorità e spezza in gruppi contigui
+        order = np.argsort(priorities, kind='stable')
+        groups, starts = np.unique(priorities[order], return_index=True)
+        result = {}
+        for priority, values in zip(groups, np.split(hours[order], starts[1:])):
+            result[int(priority)] = {
+                'count': int(len(values)),
+                'median_hours': round(float(np.median(values)), 1),
+                'mean_hours': round(float(values.mean()), 1),
+                'p90_hours': round(float(np.percentile(values, 90)), 1)
+            }
+        return result
+
+    @staticmethod
+    def _throughput(data, days):
+        """Task completati per giorno (UTC) negli ultimi 'days' giorni"""
+        today = int(time.time()) // 86400
+        completed = data['completed'][data['done'] & ~np.isnan(data['completed'])]
+        offsets = (completed // 86400).astype(np.int64) - (today - days + 1)
+        offsets = offsets[(offsets >= 0) & (offsets < days)]
+        per_day = np.bincount(offsets, minlength=days)
+
+        return {
+            'days': days,
+            'per_day': per_day.tolist(),
+            'mean_per_day': round(float(per_day.mean()), 2),
+            'best_day': int(per_day.max()),
+            'active_days': int((per_day > 0).sum())
+        }
+
+    @staticmethod
+    def _pomodoros(data):
+        """Pomodoro completati e minuti di focus per task"""
+        linked = data['session_done'] & ~np.isnan(data['session_task'])
+        if not linked.any():
+            return {'sessions': int(data['session_done'].sum()), 'tasks_with_pomodoros': 0}
+
+        task_ids = data['session_task'][linked].astype(np.int64)
+        counts = np.bincount(task_ids)
+        minutes = np.bincount(task_ids, weights=data['session_minutes'][linked])
+        used = counts > 0
+        per_task = counts[used]
+
+        # Pomodoro medi per i task completati che ne hanno usati
+        done_ids = data['id'][data['done']].astype(np.int64)
+        done_ids = done_ids[done_ids < len(counts)]
+        done_counts = counts[done_ids]
+        done_counts = done_counts[done_counts > 0]
+
+        return {
+            'sessions': int(data['session_done'].sum()),
+            'tasks_with_pomodoros': int(used.sum()),
+            'mean_per_task': round(float(per_task.mean()), 2),
+            'median_per_task': float(np.median(per_task)),
+            'mean_per_completed_task': round(float(done_counts.mean()), 2) if len(done_counts) else None,
+            'focused_minutes': int(minutes.sum())
+        }
+
+    def get_report(self, days: int = 30) -> str:
+        """Report testuale per la REPL"""
+        stats = self.compute(days)
+        if not stats['tasks']:
+            return "📝 Nessun task da analizzare"
+
+        result = f"📊 Report task ({stats['completed']}/{stats['tasks']} completati)\n"
+
+        estimation = stats['estimation']
+        if estimation:
+            p10, p50, p90 = (estimation['ratio_percentiles'][p] for p in PERCENTILES)
+            result += (f"\n🎯 Accuratezza stime ({estimation['samples']} task):\n"
+                       f"• Rapporto effettivo/stimato: mediana {p50}x (p10 {p10}x, p90 {p90}x)\n"
+                       f"• Errore medio: {estimation['mean_abs_pct_error']:.0%}, "
+                       f"sottostimati: {estimation['underestimated_share']:.0%}\n")
+            labels = [f"<{RATIO_BUCKETS[0]}x"]
+            labels += [f"{low}-{high}x" for low, high in zip(RATIO_BUCKETS, RATIO_BUCKETS[1:])]
+            labels += [f">{RATIO_BUCKETS[-1]}x"]
+            histogram = ", ".join(f"{label}: {count}" for label, count in zip(labels, estimation['ratio_histogram']))
+            result += f"• Distribuzione: {histogram}\n"
+        else:
+            result += "\n🎯 Accuratezza stime: nessun task completato con tempo effettivo\n"
+
+        if stats['cycle_time']:
+            result += "\n⏳ Tempo di ciclo per priorità:\n"
+            for priority, cycle in sorted(stats['cycle_time'].items(), reverse=True):
+                result += (f"• P{priority}: mediana {cycle['median_hours']}h, media {cycle['mean_hours']}h, "
+                           f"p90 {cycle['p90_hours']}h ({cycle['count']} task)\n")
+
+        throughput = stats['throughput']
+        last_week = " ".join(str(count) for count in throughput['per_day'][-7:])
+        result += (f"\n🚀 Throughput ({throughput['days']} giorni): {throughput['mean_per_day']} task/giorno, "
+                   f"record {throughput['best_day']}, giorni attivi {throughput['active_days']}\n"
+                   f"• Ultimi 7 giorni: {last_week}\n")
+
+        pomodoros = stats['pomodoros']
+        result += f"\n🍅 Pomodoro completati: {pomodoros['sessions']}"
+        if pomodoros['tasks_with_pomodoros']:
+            result += (f", {pomodoros['mean_per_task']} per task in media "
+                       f"(mediana {pomodoros['median_per_task']}), {pomodoros['focused_minutes']}min di focus")
+        return result
+
+    def get_context(self, days: int = 30) -> str:
+        """Metriche aggregate compatte da inserire nel prompt dell'agente remoto"""
+        stats = self.compute(days)
+        if not stats['tasks']:
+            return ""
+
+        lines = [f"Task: {stats['tasks']} totali, {stats['completed']} completati"]
+        estimation = stats['estimation']
+        if estimation:
+            lines.append(
+                f"Stime: rapporto effettivo/stimato p10/p50/p90 = "
+                f"{'/'.join(str(estimation['ratio_percentiles'][p]) for p in PERCENTILES)}, "
+                f"errore medio {estimation['mean_abs_pct_error']:.0%}, "
+                f"sottostimati {estimation['underestimated_share']:.0%} (n={estimation['samples']})"
+            )
+        for priority, cycle in sorted(stats['cycle_time'].items(), reverse=True):
+            lines.append(f"Tempo di ciclo P{priority}: mediana {cycle['median_hours']}h (n={cycle['count']})")
+        throughput = stats['throughput']
+        lines.append(f"Throughput ultimi {throughput['days']}gg: {throughput['mean_per_day']} task/giorno, "
+                     f"ultimi 7gg {throughput['per_day'][-7:]}")
+        pomodoros = stats['pomodoros']
+        if pomodoros['tasks_with_pomodoros']:
+            lines.append(f"Pomodoro: {pomodoros['sessions']} completati, {pomodoros['mean_per_task']} per task, "
+                         f"{pomodoros['focused_minutes']}min di focus")
+        return "Statistiche produttività:\n" + "\n".join(lines)
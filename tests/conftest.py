@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_agents import FakeRemoteAgent
+
+
+@pytest.fixture
+def remote_agent():
+    return FakeRemoteAgent(latency=0, embedding_latency=0)
+
+
+@pytest.fixture
+def make_rag(tmp_path, remote_agent):
+    """RAGSystem con backend numpy, agente finto e knowledge base vuota"""
+    from rag_system import RAGSystem
+
+    kb_path = tmp_path / "kb"
+    kb_path.mkdir(exist_ok=True)
+
+    def make(**options):
+        return RAGSystem(backend="numpy", persist_directory=str(tmp_path / "vectors"),
+                         kb_path=str(kb_path), remote_agent=remote_agent,
+                         outbox_path=str(tmp_path / "outbox.db"), ingest_workers=1, **options)
+
+    return make
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import urllib.request
+
+import pytest
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch, remote_agent):
+    timemind_main = pytest.importorskip("timemind_main")
+    from api_server import TimeMindAPIServer
+    from fake_agents import FakeLocalAgent
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TIMEMIND_VECTOR_BACKEND", "numpy")
+    agent = timemind_main.TimeMindAgent(FakeLocalAgent(latency=0), remote_agent,
+                                        db_path=str(tmp_path / "timemind.db"))
+    server = TimeMindAPIServer(agent, port=0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    agent.shutdown()
+
+
+def call(server, method, path, body=None, user=None):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_address[1]}{path}", method=method,
+        data=json.dumps(body).encode("utf-8") if body is not None else None,
+        headers={"X-TimeMind-User": user} if user else {}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def test_requests_without_user_act_as_default_user(server):
+    call(server, "POST", "/tasks", {"title": "Scrivere il report"}, user="alice")
+    call(server, "POST", "/knowledge", {"text": "Revisione settimanale ogni venerdì", "doc_id": "review"},
+         user="alice")
+    call(server, "POST", "/pomodoros", {}, user="alice")
+
+    assert call(server, "GET", "/health")["user"] == "default"
+    assert call(server, "GET", "/tasks") == {"tasks": []}
+    assert call(server, "GET", "/pomodoros")["message"] == "⏱️ Nessun timer Pomodoro attivo"
+    documents = call(server, "GET", "/search?q=revisione+settimanale+venerd%C3%AC&n=5")["results"]["documents"]
+    assert "Revisione settimanale ogni venerdì" not in documents
+
+    assert [task["title"] for task in call(server, "GET", "/tasks", user="alice")["tasks"]] == ["Scrivere il report"]
+    assert call(server, "GET", "/tasks", user="bob") == {"tasks": []}
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from connection_pool import ConnectionPool
+from database_manager import DatabaseManager
+from outbox import Outbox
+
+
+def all_returned(pool):
+    return pool._idle.qsize() == pool._created
+
+
+def test_connections_return_to_the_pool_on_errors(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "timemind.db"), max_size=2, timeout=0.5)
+    db = DatabaseManager(str(tmp_path / "timemind.db"), pool=pool)
+
+    for _ in range(5):
+        # Eccezione con la connessione aperta (timer senza fase)
+        with pytest.raises(KeyError):
+            db.save_pomodoro_timer({"current_cycle": 1})
+    assert all_returned(pool)
+    assert db.add_task("Scrivere il report").startswith("✅")
+
+
+def test_outbox_connections_return_to_the_pool_on_errors(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    for _ in range(10):
+        with pytest.raises(TypeError):
+            outbox.enqueue("document", "note", {"text": object()})
+    assert all_returned(outbox.pool)
+    assert outbox.due() == []
+
+
+def test_uncommitted_changes_are_rolled_back(tmp_path):
+    db = DatabaseManager(str(tmp_path / "timemind.db"))
+    with pytest.raises(RuntimeError):
+        with db._connect() as conn:
+            conn.execute("INSERT INTO tasks (title) VALUES ('Mai confermato')")
+            raise RuntimeError("errore a metà transazione")
+    assert db.list_tasks() == []
+
+
+def test_relative_paths_in_different_directories_are_different_databases(tmp_path, monkeypatch):
+    first, second = tmp_path / "a", tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+
+    monkeypatch.chdir(first)
+    db = DatabaseManager("timemind.db")
+    db.add_task("Scrivere il report")
+    Outbox("outbox.db").enqueue("document", "note", {"text": "Note"})
+
+    monkeypatch.chdir(second)
+    # Stesso nome relativo, file nuovo: lo schema va creato anche qui
+    assert DatabaseManager("timemind.db").list_tasks() == []
+    assert Outbox("outbox.db").due() == []
+    # Il primo manager resta sul suo file anche dopo il chdir
+    assert [task["title"] for task in db.list_tasks()] == ["Scrivere il report"]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import threading
+from datetime import date
+
+import pytest
+
+from database_manager import DatabaseManager
+from habit_analytics import HabitAnalytics
+
+TODAY = date(2024, 3, 10)
+TODAY_DAY = (TODAY - date(1970, 1, 1)).days
+
+
+def compute(habits, logs):
+    return HabitAnalytics(None)._compute(habits, [(habit_id, TODAY_DAY - ago) for habit_id, ago in logs], TODAY)
+
+
+def stats_by_id(result):
+    return {habit["id"]: habit for habit in result["habits"]}
+
+
+def test_current_and_longest_streaks():
+    habits = [(1, "Lettura", TODAY_DAY - 30), (2, "Corsa", TODAY_DAY - 30), (3, "Yoga", TODAY_DAY - 30)]
+    logs = (
+        # 1: oggi, ieri, l'altro ieri; in passato una serie di 4 giorni
+        [(1, 0), (1, 1), (1, 2), (1, 10), (1, 11), (1, 12), (1, 13)]
+        # 2: oggi non ancora registrato, la serie conta fino a ieri
+        + [(2, 1), (2, 2)]
+        # 3: serie interrotta ieri
+        + [(3, 2), (3, 3)]
+    )
+    stats = stats_by_id(compute(habits, logs))
+
+    assert (stats[1]["current_streak"], stats[1]["longest_streak"], stats[1]["done_today"]) == (3, 4, True)
+    assert (stats[2]["current_streak"], stats[2]["longest_streak"], stats[2]["done_today"]) == (2, 2, False)
+    assert (stats[3]["current_streak"], stats[3]["longest_streak"]) == (0, 2)
+    assert stats[1]["last_7_days"] == [False, False, False, False, True, True, True]
+
+
+def test_rates_only_count_days_since_creation():
+    # Creata 9 giorni fa: 10 giorni utili, 5 completati negli ultimi 7
+    habits = [(1, "Lettura", TODAY_DAY - 9)]
+    logs = [(1, ago) for ago in (0, 1, 2, 4, 6, 8)]
+    rates = compute(habits, logs)["habits"][0]["rates"]
+
+    assert rates[7] == pytest.approx(5 / 7)
+    assert rates[30] == pytest.approx(6 / 10)
+    assert rates[90] == pytest.approx(6 / 10)
+
+
+def test_future_logs_and_unknown_habits_are_ignored():
+    habits = [(1, "Lettura", TODAY_DAY - 5)]
+    stats = compute(habits, [(1, -3), (1, 0), (99, 0)])["habits"][0]
+
+    assert stats["current_streak"] == 1
+    assert stats["rates"][7] == pytest.approx(1 / 6)
+
+
+def test_heatmap_shows_completed_share_per_day(tmp_path):
+    db = DatabaseManager(str(tmp_path / "timemind.db"))
+    db.add_habit("Lettura")
+    db.add_habit("Corsa")
+    analytics = HabitAnalytics(db)
+    habit_id = db.list_habits()[0]["id"]
+    db.log_habit(habit_id)
+
+    rows = analytics.get_heatmap(weeks=2).splitlines()[1:]
+    today_row = rows[date.today().weekday()]
+    # Una abitudine su due completata oggi: livello intermedio; giorni prima della creazione vuoti
+    assert today_row.endswith("▒")
+    assert today_row[4:-1].strip("·") == ""
+
+
+def test_cache_is_invalidated_by_new_logs(tmp_path):
+    db = DatabaseManager(str(tmp_path / "timemind.db"))
+    db.add_habit("Lettura")
+    analytics = HabitAnalytics(db)
+    assert analytics.compute()["habits"][0]["done_today"] is False
+
+    db.log_habit(db.list_habits()[0]["id"])
+    assert analytics.compute()["habits"][0]["done_today"] is True
+
+
+def test_habit_version_increments_are_not_lost(tmp_path):
+    db = DatabaseManager(str(tmp_path / "timemind.db"))
+
+    def bump():
+        for _ in range(2000):
+            db._habits_changed()
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert db.habit_version == 16000
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from ingestion import iter_parse_files, simhash
+
+
+def test_iter_parse_files_yields_every_file(tmp_path):
+    paths = []
+    for i in range(7):
+        path = tmp_path / f"note{i}.txt"
+        path.write_text(f"Paragrafo del file {i}\n\nSecondo paragrafo del file {i}", encoding="utf-8")
+        paths.append(str(path))
+    (tmp_path / "rotto.xyz").write_text("formato sconosciuto", encoding="utf-8")
+    paths.append(str(tmp_path / "rotto.xyz"))
+
+    results = dict(iter_parse_files(paths, max_chars=30, max_workers=2))
+    assert set(results) == set(paths)
+    assert isinstance(results[str(tmp_path / "rotto.xyz")], ValueError)
+    chunks = results[paths[3]]
+    assert [text for text, _ in chunks] == ["Paragrafo del file 3", "Secondo paragrafo del file 3"]
+    assert [text_hash for _, text_hash in chunks] == [simhash(text) for text, _ in chunks]
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+import database_manager
+from database_manager import DEFAULT_USER_ID, DatabaseManager
+from pomodoro_scheduler import PomodoroScheduler
+from vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "timemind.db"))
+
+
+def test_tasks_are_isolated(db):
+    alice, bob = db.for_user("alice"), db.for_user("bob")
+    alice.add_task("Scrivere il report")
+    task_id = alice.list_tasks()[0]["id"]
+
+    assert bob.list_tasks() == []
+    assert db.list_tasks() == []
+    assert bob.complete_task(task_id).startswith("❌")
+    assert bob.delete_task(task_id).startswith("❌")
+    assert not bob.has_task(task_id)
+    assert [task["title"] for task in alice.list_tasks()] == ["Scrivere il report"]
+
+
+def test_user_views_are_bounded(db, monkeypatch):
+    monkeypatch.setattr(database_manager, "MAX_TENANT_VIEWS", 3)
+    alice = db.for_user("alice")
+    db.for_user("bob")
+    assert db.for_user("alice") is alice
+
+    # Il limite scarta l'utente usato meno di recente (bob), mai la vista iniziale
+    db.for_user("carol")
+    assert list(db._tenants) == [DEFAULT_USER_ID, "alice", "carol"]
+    db.for_user("dave")
+    assert list(db._tenants) == [DEFAULT_USER_ID, "carol", "dave"]
+    assert db.for_user(DEFAULT_USER_ID) is db
+    # Una vista scartata viene ricreata e vede gli stessi dati
+    alice.add_task("Scrivere il report")
+    assert [task["title"] for task in db.for_user("alice").list_tasks()] == ["Scrivere il report"]
+
+
+def test_habits_are_isolated(db):
+    alice, bob = db.for_user("alice"), db.for_user("bob")
+    alice.add_habit("Meditazione")
+    habit_id = alice.list_habits()[0]["id"]
+
+    assert bob.list_habits() == []
+    assert bob.log_habit(habit_id) == f"❌ Abitudine {habit_id} non trovata"
+    assert alice.log_habit(habit_id).startswith("✅")
+
+
+def test_timers_are_isolated(db):
+    scheduler = PomodoroScheduler(db, notify=None)
+    alice = db.for_user("alice")
+    alice.add_task("Scrivere il report")
+    task_id = alice.list_tasks()[0]["id"]
+
+    # Un Pomodoro si avvia solo su un task dell'utente
+    assert scheduler.start_pomodoro(task_id, user_id="bob") == f"❌ Task {task_id} non trovato"
+    assert scheduler.start_pomodoro(task_id) == f"❌ Task {task_id} non trovato"
+    assert scheduler.start_pomodoro(task_id, user_id="alice").startswith("🍅")
+    timer_id = next(iter(scheduler._timers))
+
+    for user_id in ("bob", None):
+        assert scheduler.status(user_id) == "⏱️ Nessun timer Pomodoro attivo"
+        assert scheduler.cancel(timer_id, user_id) == f"❌ Timer Pomodoro {timer_id} non attivo"
+    assert f"Timer {timer_id}, task {task_id}" in scheduler.status("alice")
+    assert scheduler.cancel(timer_id, "alice").startswith("⏹️")
+
+
+def test_knowledge_documents_are_isolated(make_rag):
+    rag = make_rag()
+    rag.add_document("Revisione settimanale ogni venerdì", "review", user_id="alice")
+    rag.add_document("Revisione trimestrale degli obiettivi", "review")
+
+    def found(user_id):
+        results = rag.search_documents("revisione", n_results=5, user_id=user_id)
+        return sorted(results["documents"]) if results else []
+
+    assert found("alice") == ["Revisione settimanale ogni venerdì"]
+    assert found("bob") == []
+    # Senza utente si cerca come utente di default, non tra tutti gli utenti
+    assert found(None) == found(DEFAULT_USER_ID) == ["Revisione trimestrale degli obiettivi"]
+
+    assert rag.delete_document("review", user_id="bob").startswith("✅")
+    assert found("alice") == ["Revisione settimanale ogni venerdì"]
+
+
+def test_legacy_database_is_migrated_to_default_user(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, description TEXT,
+            priority INTEGER DEFAULT 2, status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, completed_at TIMESTAMP,
+            estimated_minutes INTEGER, actual_minutes INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE habits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, description TEXT,
+            target_frequency TEXT DEFAULT 'daily', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            active BOOLEAN DEFAULT 1
+        )
+    """)
+    conn.execute("INSERT INTO tasks (title) VALUES ('Task esistente')")
+    conn.execute("INSERT INTO habits (name) VALUES ('Abitudine esistente')")
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(path)
+    assert [task["title"] for task in db.list_tasks()] == ["Task esistente"]
+    assert [habit["name"] for habit in db.list_habits()] == ["Abitudine esistente"]
+    assert db.for_user("alice").list_tasks() == []
+    assert db.for_user("alice").list_habits() == []
+
+
+def test_legacy_documents_are_migrated_to_default_user(tmp_path, make_rag, remote_agent):
+    store = NumpyVectorStore(str(tmp_path / "vectors"))
+    store.upsert(["note"], [remote_agent.generate_embedding("Note di riunione del lunedì")],
+                 ["Note di riunione del lunedì"], [{"source": "knowledge_base", "doc_id": "note"}])
+
+    rag = make_rag()
+    assert rag.search_documents("riunione", user_id="alice") is None
+    results = rag.search_documents("riunione")
+    assert results["documents"] == ["Note di riunione del lunedì"]
+    assert results["metadatas"][0]["tenant"] == DEFAULT_USER_ID
+
+    assert rag.delete_document("note").startswith("✅")
+    assert rag.search_documents("riunione") is None
+
+
+def test_root_agent_is_scoped_to_default_user(tmp_path, monkeypatch, remote_agent):
+    timemind_main = pytest.importorskip("timemind_main")
+    from fake_agents import FakeLocalAgent
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TIMEMIND_VECTOR_BACKEND", "numpy")
+    agent = timemind_main.TimeMindAgent(FakeLocalAgent(latency=0), remote_agent,
+                                        db_path=str(tmp_path / "timemind.db"))
+    try:
+        alice = agent.for_user("alice")
+        alice.add_task("Scrivere il report")
+        alice.add_knowledge("Revisione settimanale ogni venerdì", "review")
+        alice.start_pomodoro()
+
+        assert agent.user_id == DEFAULT_USER_ID
+        assert agent.list_tasks() == []
+        assert agent.get_pomodoro_status() == "⏱️ Nessun timer Pomodoro attivo"
+        assert "venerdì" not in agent.search_knowledge("revisione settimanale venerdì")
+    finally:
+        agent.shutdown()
+
+
+def test_agent_user_views_are_bounded(tmp_path, monkeypatch, remote_agent):
+    timemind_main = pytest.importorskip("timemind_main")
+    from fake_agents import FakeLocalAgent
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TIMEMIND_VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(timemind_main, "MAX_TENANT_VIEWS", 2)
+    agent = timemind_main.TimeMindAgent(FakeLocalAgent(latency=0), remote_agent,
+                                        db_path=str(tmp_path / "timemind.db"))
+    try:
+        alice = agent.for_user("alice")
+        agent.for_user("bob")
+        assert agent.for_user("alice") is alice
+        agent.for_user("carol")
+
+        assert list(agent._tenants) == ["alice", "carol"]
+    finally:
+        agent.shutdown()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+import random
+import sqlite3
+import time
+
+import pytest
+
+from circuit_breaker import CircuitBreaker
+from outbox import Outbox, OutboxWorker
+
+
+class FakeRAG:
+    """RAGSystem ridotto a quanto usa il worker: outbox, breaker e retry_job"""
+
+    def __init__(self, outbox, result=False, breaker=None):
+        self.outbox = outbox
+        self.result = result
+        self.remote_agent = type("Remote", (), {"breaker": breaker})()
+        self.jobs = []
+
+    def retry_job(self, job):
+        self.jobs.append(job['key'])
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.db"))
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(random, "uniform", lambda low, high: 1.0)
+
+
+def only_job(outbox):
+    (job,) = outbox.due()
+    return job
+
+
+def make_due(outbox):
+    """Anticipa il prossimo tentativo di tutti i job"""
+    with outbox.pool.connect() as conn:
+        conn.execute("UPDATE outbox_jobs SET next_attempt_at = 0")
+        conn.commit()
+
+
+def test_enqueue_bumps_version_only_when_payload_changes(outbox):
+    outbox.enqueue("document", "note", {"text": "Prima"})
+    outbox.enqueue("document", "note", {"text": "Prima"})
+    assert only_job(outbox)["version"] == 1
+
+    outbox.enqueue("document", "note", {"text": "Seconda"})
+    job = only_job(outbox)
+    assert (job["version"], job["payload"]) == (2, {"text": "Seconda"})
+
+
+def test_stale_job_is_not_current_and_not_completed(outbox):
+    outbox.enqueue("document", "note", {"text": "Prima"})
+    stale = only_job(outbox)
+    outbox.enqueue("document", "note", {"text": "Seconda"})
+
+    assert not outbox.is_current(stale)
+    outbox.complete(stale)
+    current = only_job(outbox)
+    assert outbox.is_current(current)
+    outbox.complete(current)
+    assert outbox.due() == []
+
+
+def test_failed_attempts_back_off_exponentially(outbox):
+    worker = OutboxWorker(FakeRAG(outbox), base_delay=10, max_delay=60)
+    outbox.enqueue("document", "note", {"text": "Note"})
+
+    delays = []
+    for _ in range(5):
+        before = time.time()
+        worker._process(only_job(outbox))
+        delays.append(round(outbox.stats()["next_attempt_in"] + time.time() - before))
+        make_due(outbox)
+
+    assert delays == [10, 20, 40, 60, 60]
+    assert only_job(outbox)["attempts"] == 5
+    assert worker.last_error == "document 'note': servizio embedding non disponibile"
+
+
+def test_successful_retry_removes_the_job(outbox):
+    rag = FakeRAG(outbox, result=True)
+    worker = OutboxWorker(rag)
+    outbox.enqueue("file", "note.md", {})
+
+    worker._process(only_job(outbox))
+    assert outbox.stats()["pending"] == 0
+    assert worker.processed == 1
+
+
+def test_job_is_dead_lettered_after_max_attempts(outbox):
+    worker = OutboxWorker(FakeRAG(outbox, result=ValueError("file illeggibile")), max_attempts=3)
+    outbox.enqueue("file", "note.md", {})
+
+    for _ in range(3):
+        worker._process(only_job(outbox))
+        make_due(outbox)
+
+    stats = outbox.stats()
+    assert (stats["pending"], stats["failed"]) == (0, 1)
+    assert outbox.due() == []
+    assert "Job falliti (abbandonati dopo 3 tentativi): 1" in worker.status()
+
+    # Accodato di nuovo (es. file modificato): riparte da zero tentativi
+    outbox.enqueue("file", "note.md", {})
+    job = only_job(outbox)
+    assert (job["attempts"], outbox.stats()["failed"]) == (0, 0)
+
+
+def test_failures_while_service_is_down_are_not_final(outbox):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure("offline")
+    worker = OutboxWorker(FakeRAG(outbox, breaker=breaker), max_attempts=1)
+    outbox.enqueue("document", "note", {"text": "Note"})
+
+    worker._process(only_job(outbox))
+    assert outbox.stats()["failed"] == 0
+    assert outbox.stats()["pending"] == 1
+
+
+def test_newer_version_is_not_dead_lettered(outbox):
+    worker = OutboxWorker(FakeRAG(outbox), max_attempts=1)
+    outbox.enqueue("document", "note", {"text": "Prima"})
+    stale = only_job(outbox)
+    outbox.enqueue("document", "note", {"text": "Seconda"})
+
+    worker._process(stale)
+    assert outbox.stats()["failed"] == 0
+    assert only_job(outbox)["version"] == 2
+
+
+def test_worker_waits_while_the_circuit_is_open(outbox):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.3)
+    breaker.record_failure("offline")
+    rag = FakeRAG(outbox, result=True, breaker=breaker)
+    outbox.enqueue("document", "note", {"text": "Note"})
+
+    worker = OutboxWorker(rag, poll_interval=0.05)
+    worker.start()
+    try:
+        time.sleep(0.15)
+        assert rag.jobs == []
+        # Allo scadere del timeout del circuito il job viene riprovato
+        deadline = time.monotonic() + 3
+        while outbox.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        worker.stop()
+
+    assert rag.jobs == ["note"]
+    assert outbox.stats()["pending"] == 0
+
+
+def test_legacy_queue_gets_the_status_column(tmp_path):
+    path = str(tmp_path / "legacy_outbox.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE outbox_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL,
+            payload TEXT NOT NULL, version INTEGER DEFAULT 1, attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL, last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE (kind, key)
+        )
+    """)
+    conn.execute("""INSERT INTO outbox_jobs (kind, key, payload, next_attempt_at) VALUES ('file', 'note.md', '{}', 0)""")
+    conn.commit()
+    conn.close()
+
+    outbox = Outbox(path)
+    assert [job["key"] for job in outbox.due()] == ["note.md"]
+    assert outbox.stats()["failed"] == 0
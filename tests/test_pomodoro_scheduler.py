@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from database_manager import DatabaseManager
+from pomodoro_scheduler import PomodoroScheduler
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(str(tmp_path / "timemind.db"))
+
+
+@pytest.fixture
+def task_id(db):
+    db.add_task("Scrivere il report")
+    return db.list_tasks()[0]["id"]
+
+
+def make_scheduler(db, **options):
+    return PomodoroScheduler(db, notify=None, **options)
+
+
+def only_timer(scheduler):
+    (timer,) = scheduler._timers.values()
+    return timer
+
+
+def shift_session_start(db, session_id, minutes_ago):
+    """Sposta indietro l'inizio di una sessione (come se fosse partita prima)"""
+    with db._connect() as conn:
+        conn.execute("UPDATE pomodoro_sessions SET start_time = ? WHERE id = ?",
+                     (datetime.now() - timedelta(minutes=minutes_ago), session_id))
+        conn.commit()
+
+
+def actual_minutes(db, task_id):
+    with db._connect() as conn:
+        (minutes,) = conn.execute("SELECT actual_minutes FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    return minutes
+
+
+def expire(scheduler):
+    """Fa scadere adesso la fase del timer e la fa avanzare"""
+    timer = only_timer(scheduler)
+    timer["phase_ends_at"] = datetime.now()
+    scheduler._advance(timer)
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_cycles_alternate_focus_and_breaks_with_long_break(db, task_id):
+    scheduler = make_scheduler(db, short_break_minutes=5, long_break_minutes=15, long_break_every=2)
+    scheduler.start_pomodoro(task_id, cycles=3)
+
+    phases = []
+    for _ in range(4):
+        expire(scheduler)
+        timer = only_timer(scheduler)
+        remaining = round((timer["phase_ends_at"] - datetime.now()).total_seconds() / 60)
+        phases.append((timer["phase"], timer["current_cycle"], remaining))
+
+    assert phases == [("break", 1, 5), ("focus", 2, 25), ("break", 2, 15), ("focus", 3, 25)]
+    expire(scheduler)
+    assert scheduler._timers == {}
+
+
+def test_last_focus_completes_the_timer(db, task_id):
+    scheduler = make_scheduler(db)
+    scheduler.start_pomodoro(task_id, cycles=1)
+    scheduler._advance(only_timer(scheduler))
+
+    assert scheduler._timers == {}
+    assert db.get_active_pomodoro_timers() == []
+    assert scheduler.status() == "⏱️ Nessun timer Pomodoro attivo"
+
+
+def test_focus_minutes_accumulate_on_the_task(db, task_id):
+    scheduler = make_scheduler(db)
+    scheduler.start_pomodoro(task_id, cycles=2)
+
+    timer = only_timer(scheduler)
+    shift_session_start(db, timer["session_id"], 25)
+    scheduler._advance(timer)
+    scheduler._advance(only_timer(scheduler))
+
+    # Secondo ciclo: nuova sessione con altri 25 minuti di focus
+    timer = only_timer(scheduler)
+    shift_session_start(db, timer["session_id"], 25)
+    scheduler._advance(timer)
+
+    assert actual_minutes(db, task_id) == 50
+
+
+def test_cancel_during_focus_records_elapsed_minutes(db, task_id):
+    scheduler = make_scheduler(db)
+    scheduler.start_pomodoro(task_id, cycles=2)
+    timer = only_timer(scheduler)
+    shift_session_start(db, timer["session_id"], 10)
+
+    assert scheduler.cancel(timer["id"]) == f"⏹️ Timer Pomodoro {timer['id']} interrotto"
+    assert actual_minutes(db, task_id) == 10
+    assert db.get_active_pomodoro_timers() == []
+    # Un passaggio di fase già in corso non riattiva il timer annullato
+    scheduler._advance(timer)
+    assert scheduler._timers == {}
+
+
+def test_cancel_during_break_records_nothing_more(db, task_id):
+    scheduler = make_scheduler(db)
+    scheduler.start_pomodoro(task_id, cycles=2)
+    timer = only_timer(scheduler)
+    shift_session_start(db, timer["session_id"], 25)
+    scheduler._advance(timer)
+
+    scheduler.cancel(timer["id"])
+    assert actual_minutes(db, task_id) == 25
+
+
+def test_resume_after_downtime_closes_focus_at_its_planned_end(db, task_id):
+    first = make_scheduler(db)
+    first.start_pomodoro(task_id, cycles=2)
+    timer = only_timer(first)
+
+    # Processo fermo per un'ora: focus iniziato 60 minuti fa, scaduto da 35
+    shift_session_start(db, timer["session_id"], 60)
+    timer["phase_ends_at"] = datetime.now() - timedelta(minutes=35)
+    db.save_pomodoro_timer(timer)
+
+    second = make_scheduler(db)
+    assert second.start() == "⏱️ Scheduler Pomodoro avviato (1 timer ripresi)"
+    try:
+        assert wait_until(lambda: only_timer(second)["phase"] == "break")
+    finally:
+        second.stop()
+
+    # Focus chiuso a min(adesso, scadenza): 25 minuti, non 60
+    assert actual_minutes(db, task_id) == 25
+    # La pausa parte da adesso, non dalla scadenza passata
+    resumed = db.get_active_pomodoro_timers()[0]
+    assert resumed["phase"] == "break"
+    assert resumed["phase_ends_at"] > datetime.now() + timedelta(minutes=4)
+
+
+def test_failed_phase_change_is_retried(db, task_id, monkeypatch):
+    scheduler = make_scheduler(db, focus_minutes=0.001, retry_seconds=0.05)
+    complete = db.complete_pomodoro
+    failures = []
+
+    def flaky(*args, **kwargs):
+        if not failures:
+            failures.append(True)
+            raise RuntimeError("database is locked")
+        return complete(*args, **kwargs)
+
+    monkeypatch.setattr(db, "complete_pomodoro", flaky)
+    scheduler.start()
+    try:
+        scheduler.start_pomodoro(task_id, cycles=1)
+        assert wait_until(lambda: not scheduler._timers)
+    finally:
+        scheduler.stop()
+
+    assert failures == [True]
+    assert db.get_active_pomodoro_timers() == []
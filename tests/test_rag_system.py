@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from rag_system import date_value
+
+
+def test_date_value_accepts_iso_strings_and_ints():
+    assert date_value("2024-03-05") == 20240305
+    assert date_value(20240305) == 20240305
+    with pytest.raises(ValueError):
+        date_value("05/03/2024")
+
+
+def test_search_filters_by_date_range(make_rag):
+    rag = make_rag()
+    for doc_id, day in (("jan", "2024-01-10"), ("feb", "2024-02-10"), ("mar", "2024-03-10")):
+        rag.add_document(f"revisione settimanale {doc_id}", doc_id, metadata={"date": date_value(day)})
+
+    results = rag.search_documents("revisione settimanale", n_results=5,
+                                   date_from="2024-02-01", date_to="2024-03-31")
+    assert sorted(metadata["doc_id"] for metadata in results["metadatas"]) == ["feb", "mar"]
+
+    results = rag.search_documents("revisione settimanale", n_results=5, where={"date": "2024-01-10"})
+    assert [metadata["doc_id"] for metadata in results["metadatas"]] == ["jan"]
+
+
+def test_invalid_date_filter_raises(make_rag):
+    with pytest.raises(ValueError):
+        make_rag().search_documents("revisione", date_from="ieri")
+
+
+def test_truncated_embeddings_are_renormalized(make_rag):
+    rag = make_rag(embedding_dimensions=32)
+    embedding = rag._embed("revisione settimanale del progetto", "RETRIEVAL_DOCUMENT")
+    embeddings = rag._embed_batch(["piano trimestrale", "note di riunione"], "RETRIEVAL_DOCUMENT")
+
+    for vector in [embedding] + embeddings:
+        assert len(vector) == 32
+        assert sum(value * value for value in vector) == pytest.approx(1.0)
+
+
+SHARED = "Checklist condivisa: controllare le scadenze del progetto ogni lunedì mattina"
+
+
+def write_kb_file(rag, filename, *paragraphs):
+    with open(os.path.join(rag.kb_path, filename), "w", encoding="utf-8") as f:
+        f.write("\n\n".join(paragraphs))
+
+
+def test_duplicates_are_dropped_only_within_a_file(make_rag):
+    rag = make_rag(chunk_chars=100)
+    write_kb_file(rag, "a.txt", SHARED, "Note sul progetto alfa e sul suo budget", SHARED)
+    write_kb_file(rag, "b.txt", SHARED, "Note sul progetto beta e sui suoi rischi")
+
+    assert "1 duplicati scartati" in rag.sync_file("a.txt")
+    assert "0 duplicati scartati" in rag.sync_file("b.txt")
+
+
+def test_removing_a_file_keeps_passages_shared_with_other_files(make_rag):
+    rag = make_rag(chunk_chars=100)
+    write_kb_file(rag, "a.txt", SHARED, "Note sul progetto alfa e sul suo budget")
+    write_kb_file(rag, "b.txt", SHARED, "Note sul progetto beta e sui suoi rischi")
+    rag.sync_file("a.txt")
+    rag.sync_file("b.txt")
+
+    os.remove(os.path.join(rag.kb_path, "a.txt"))
+    rag.remove_file("a.txt")
+
+    results = rag.search_documents(SHARED, n_results=5)
+    assert SHARED in results["documents"]
+    assert {metadata["file"] for metadata in results["metadatas"]} == {"b.txt"}
+
+
+def test_context_for_query_accepts_date_range(make_rag):
+    rag = make_rag()
+    rag.add_document("revisione settimanale di gennaio", "jan", metadata={"date": date_value("2024-01-10")})
+    rag.add_document("revisione settimanale di marzo", "mar", metadata={"date": date_value("2024-03-10")})
+
+    context = rag.get_context_for_query("revisione settimanale", n_results=5, date_from="2024-03-01")
+    assert context == "revisione settimanale di marzo"
+
+
+def test_search_ef_is_applied_to_existing_chroma_collection(tmp_path):
+    pytest.importorskip("chromadb")
+    from vector_store import ChromaVectorStore
+
+    config = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+    ChromaVectorStore(str(tmp_path), hnsw_config=config)
+    reopened = ChromaVectorStore(str(tmp_path), hnsw_config={**config, "hnsw:search_ef": 80})
+    assert reopened.collection.metadata["hnsw:search_ef"] == 80
+    assert reopened.collection.metadata["hnsw:M"] == 16
+
+
+@pytest.mark.parametrize("online", [True, False])
+def test_changed_embedding_dimensions_rebuild_the_store(make_rag, remote_agent, online):
+    rag = make_rag(embedding_dimensions=64, chunk_chars=100)
+    write_kb_file(rag, "a.txt", "Note sul progetto alfa e sul suo budget")
+    rag.load_knowledge_base()
+    rag.add_document("Revisione settimanale ogni venerdì", "review")
+
+    remote_agent.online = online
+    rag = make_rag(embedding_dimensions=32, chunk_chars=100)
+    remote_agent.online = True
+    if not online:
+        assert rag.outbox.stats()["pending"] == 2
+        for job in rag.outbox.due():
+            assert rag.retry_job(job)
+            rag.outbox.complete(job)
+
+    assert rag.vector_store.dimensions() == 32
+    assert rag.search_documents("revisione settimanale")["documents"][0] == "Revisione settimanale ogni venerdì"
+    assert rag.search_documents("progetto alfa budget")["metadatas"][0]["file"] == "a.txt"
+
+
+def test_failed_embedding_batch_keeps_stored_batches_and_resumes(make_rag, remote_agent, monkeypatch):
+    import rag_system
+    monkeypatch.setattr(rag_system, "EMBED_BATCH_SIZE", 2)
+    rag = make_rag(chunk_chars=40)
+    paragraphs = [f"Paragrafo numero {i} del manuale operativo" for i in range(5)]
+    write_kb_file(rag, "manuale.txt", *paragraphs)
+
+    generate = remote_agent.generate_embeddings
+    requested = []
+    calls = []
+
+    def flaky(texts, *args, **kwargs):
+        # Il secondo lotto del primo tentativo fallisce
+        calls.append(texts)
+        requested.extend(texts)
+        return None if len(calls) == 2 else generate(texts, *args, **kwargs)
+
+    remote_agent.generate_embeddings = flaky
+    message = rag.sync_file("manuale.txt")
+    assert message.startswith("⏳") and "2/5" in message
+    assert len(rag._file_chunk_ids("manuale.txt")) == 2
+    assert rag._load_file_index() == {"manuale.txt": None}
+
+    requested.clear()
+    job = rag.outbox.due()[0]
+    assert rag.retry_job(job)
+    assert requested == paragraphs[2:]
+    assert sorted(rag.search_documents("manuale operativo", n_results=10)["documents"]) == paragraphs
+    assert rag.sync_file("manuale.txt") is None
+
+
+def test_vectors_and_outbox_are_stored_in_data_dir(tmp_path, remote_agent):
+    from rag_system import RAGSystem
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    rag = RAGSystem(backend="numpy", data_dir=str(data_dir), kb_path=str(tmp_path / "kb"),
+                    remote_agent=remote_agent, ingest_workers=1)
+
+    assert rag.persist_directory == str(data_dir / "timemind_vectors")
+    assert os.path.exists(data_dir / "timemind_outbox.db")
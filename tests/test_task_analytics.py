@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from task_analytics import TaskAnalytics
+
+HOUR = 3600
+DAY = 86400
+
+
+class TaskData:
+    """Righe nel formato di DatabaseManager.load_task_data"""
+
+    def __init__(self, tasks, sessions=()):
+        self.tasks = tasks
+        self.sessions = list(sessions)
+
+    def load_task_data(self):
+        return self.tasks, self.sessions
+
+
+def midday(days_ago):
+    """Mezzogiorno UTC di 'days_ago' giorni fa, in secondi Unix"""
+    return (int(time.time()) // DAY - days_ago) * DAY + 12 * HOUR
+
+
+def task(task_id, priority=2, done=True, created=None, completed=None, estimated=None, actual=None):
+    status = "completed" if done else "pending"
+    return (task_id, priority, status, created, completed, estimated, actual)
+
+
+def test_estimation_ratios_and_histogram():
+    analytics = TaskAnalytics(TaskData([
+        task(1, estimated=30, actual=30),
+        task(2, estimated=30, actual=60),
+        task(3, estimated=60, actual=15),
+        task(4, estimated=30, actual=None),
+        task(5, done=False, estimated=30, actual=90),
+    ]))
+    estimation = analytics.compute()["estimation"]
+
+    assert estimation["samples"] == 3
+    assert estimation["ratio_percentiles"][50] == 1.0
+    assert estimation["underestimated_share"] == pytest.approx(1 / 3)
+    assert estimation["mean_abs_pct_error"] == pytest.approx((0 + 1 + 0.75) / 3)
+    # Bucket: <0.5, 0.5-0.8, 0.8-1.2, 1.2-1.5, 1.5-2.0, >2.0 (2.0 incluso nell'ultimo)
+    assert estimation["ratio_histogram"] == [1, 0, 1, 0, 0, 1]
+
+
+def test_cycle_time_grouped_by_priority():
+    created = midday(10)
+    analytics = TaskAnalytics(TaskData([
+        task(1, priority=3, created=created, completed=created + 2 * HOUR),
+        task(2, priority=3, created=created, completed=created + 4 * HOUR),
+        task(3, priority=1, created=created, completed=created + 48 * HOUR),
+        task(4, priority=1, done=False, created=created),
+    ]))
+    cycle = analytics.compute()["cycle_time"]
+
+    assert set(cycle) == {1, 3}
+    assert (cycle[3]["count"], cycle[3]["median_hours"], cycle[3]["mean_hours"]) == (2, 3.0, 3.0)
+    assert (cycle[1]["count"], cycle[1]["median_hours"]) == (1, 48.0)
+
+
+def test_throughput_window():
+    analytics = TaskAnalytics(TaskData([
+        task(1, completed=midday(0)),
+        task(2, completed=midday(0)),
+        task(3, completed=midday(2)),
+        task(4, completed=midday(7)),
+        task(5, done=False, completed=midday(0)),
+    ]))
+    throughput = analytics.compute(days=7)["throughput"]
+
+    assert throughput["per_day"] == [0, 0, 0, 0, 1, 0, 2]
+    assert throughput["mean_per_day"] == round(3 / 7, 2)
+    assert (throughput["best_day"], throughput["active_days"]) == (2, 2)
+
+
+@pytest.mark.parametrize("days", [0, -5])
+def test_throughput_window_must_be_positive(days):
+    with pytest.raises(ValueError):
+        TaskAnalytics(TaskData([task(1, completed=midday(0))])).compute(days)
+
+
+def test_pomodoros_per_task():
+    analytics = TaskAnalytics(TaskData(
+        [task(1), task(2, done=False)],
+        [(1, 1, 25), (1, 1, 20), (2, 1, 25), (2, 0, 0), (None, 1, 25)]
+    ))
+    pomodoros = analytics.compute()["pomodoros"]
+
+    assert pomodoros["sessions"] == 4
+    assert pomodoros["tasks_with_pomodoros"] == 2
+    assert (pomodoros["mean_per_task"], pomodoros["median_per_task"]) == (1.5, 1.5)
+    assert pomodoros["mean_per_completed_task"] == 2.0
+    assert pomodoros["focused_minutes"] == 70
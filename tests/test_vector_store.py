@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import os
+import random
+
+import numpy as np
+import pytest
+
+from vector_store import NumpyVectorStore, _matches
+
+
+def make_records(count, dim=16, seed=0):
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    metadatas = []
+    for row in range(count):
+        metadata = {"origin": rng.choice(["file", "user"]), "date": rng.randint(20240101, 20241231)}
+        if rng.random() < 0.7:
+            metadata["topic"] = rng.choice(["lavoro", "salute", "studio"])
+        if metadata["origin"] == "user":
+            metadata["tenant"] = rng.choice(["default", "alice", "bob"])
+        metadatas.append(metadata)
+    ids = [f"doc{row}" for row in range(count)]
+    return ids, vectors, [f"testo {row}" for row in range(count)], metadatas
+
+
+FILTERS = [
+    {"topic": "lavoro"},
+    {"topic": {"$ne": "lavoro"}},
+    {"topic": {"$in": ["salute", "studio"]}},
+    {"topic": {"$nin": ["salute", None]}},
+    {"topic": "inesistente"},
+    {"date": {"$gte": 20240601}},
+    {"$and": [{"date": {"$gt": 20240301}}, {"date": {"$lte": 20240930}}]},
+    {"$and": [{"origin": "file"}, {"topic": {"$eq": "studio"}}]},
+    {"$or": [{"origin": "file"}, {"tenant": "alice"}]},
+    {"$and": [{"$or": [{"origin": "file"}, {"tenant": "bob"}]}, {"date": {"$lt": 20240701}}]},
+]
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_filter_mask_matches_row_by_row_evaluation(tmp_path, where):
+    store = NumpyVectorStore(str(tmp_path))
+    ids, vectors, documents, metadatas = make_records(300)
+    store.upsert(ids[:200], vectors[:200], documents[:200], metadatas[:200])
+    store.query([vectors[0]], where=where)
+    # Le colonne già costruite vanno estese con i nuovi record
+    store.upsert(ids[200:], vectors[200:], documents[200:], metadatas[200:])
+    store.delete(ids[:10])
+
+    expected = [doc_id for doc_id, metadata in zip(ids[10:], metadatas[10:]) if _matches(metadata, where)]
+    assert store.get(where=where)["ids"] == expected
+
+
+def test_torn_last_record_is_discarded(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    ids, vectors, documents, metadatas = make_records(3)
+    store.upsert(ids, vectors, documents, metadatas)
+
+    # Arresto durante la scrittura del quarto record: vettore scritto, record a metà
+    with open(store.vectors_path, "ab") as f:
+        f.write(vectors[0].tobytes())
+    with open(store.records_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "doc3", "dim": 16, "docu')
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert reopened.get()["ids"] == ids
+    # Il record parziale è rimosso: le scritture successive restano leggibili
+    reopened.upsert(["doc4"], vectors[:1], ["testo 4"], [{"origin": "file"}])
+    assert NumpyVectorStore(str(tmp_path)).get()["ids"] == ids + ["doc4"]
+
+
+def test_corrupt_record_before_the_end_raises(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    ids, vectors, documents, metadatas = make_records(2)
+    store.upsert(ids[:1], vectors[:1], documents[:1], metadatas[:1])
+    with open(store.records_path, "a", encoding="utf-8") as f:
+        f.write("{non json}\n")
+    store.upsert(ids[1:], vectors[1:], documents[1:], metadatas[1:])
+
+    with pytest.raises(ValueError):
+        NumpyVectorStore(str(tmp_path))
+
+
+@pytest.mark.parametrize("quantization", [None, "int8", "binary"])
+def test_every_vector_is_its_own_nearest_neighbour(tmp_path, quantization):
+    ids, vectors, documents, metadatas = make_records(600, dim=64)
+    store = NumpyVectorStore(str(tmp_path), quantization=quantization)
+    # Upsert in più lotti: i codici vengono accodati in memoria
+    for start in range(0, 600, 150):
+        end = start + 150
+        store.upsert(ids[start:end], vectors[start:end], documents[start:end], metadatas[start:end])
+
+    for current in (store, NumpyVectorStore(str(tmp_path), quantization=quantization)):
+        results = current.query(vectors, n_results=1)
+        assert [found[0] for found in results["ids"]] == ids
+
+
+def compacted_store(tmp_path, quantization=None):
+    ids, vectors, documents, metadatas = make_records(300, dim=32)
+    store = NumpyVectorStore(str(tmp_path), quantization=quantization)
+    store.upsert(ids, vectors, documents, metadatas)
+    store.delete(ids[::2])
+    return store, ids[1::2], vectors[1::2]
+
+
+def assert_store_contains(store, ids, vectors):
+    assert store.get()["ids"] == ids
+    assert [found[0] for found in store.query(vectors, n_results=1)["ids"]] == ids
+
+
+@pytest.mark.parametrize("quantization", [None, "int8"])
+def test_compact_drops_deleted_rows(tmp_path, quantization):
+    store, ids, vectors = compacted_store(tmp_path, quantization)
+    store.compact()
+
+    for current in (store, NumpyVectorStore(str(tmp_path), quantization=quantization)):
+        assert len(current._ids) == len(ids)
+        assert_store_contains(current, ids, vectors)
+
+
+def test_compact_interrupted_while_writing_keeps_original_files(tmp_path):
+    store, ids, vectors = compacted_store(tmp_path)
+    # Arresto durante la scrittura: file nuovi parziali, nessuna conferma
+    with open(store.vectors_path + ".new", "wb") as f:
+        f.write(b"\0" * 100)
+    with open(store.records_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write('{"id": "doc1"')
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert_store_contains(reopened, ids, vectors)
+    assert not os.path.exists(store.vectors_path + ".new")
+    assert not os.path.exists(store.records_path + ".tmp")
+
+
+def test_compact_interrupted_after_commit_is_completed_on_load(tmp_path, monkeypatch):
+    store, ids, vectors = compacted_store(tmp_path)
+    replace = os.replace
+    calls = []
+
+    def crash_after_commit(src, dst):
+        calls.append(dst)
+        if len(calls) > 1:
+            raise OSError("arresto simulato")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", crash_after_commit)
+    with pytest.raises(OSError):
+        store.compact()
+    monkeypatch.setattr(os, "replace", replace)
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert len(reopened._ids) == len(ids)
+    assert_store_contains(reopened, ids, vectors)
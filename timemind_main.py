@@ -4,27 +4,61 @@ TimeMind - Main Application
 Coach personale per organizzare il tempo con agenti ibridi e RAG
 
 Prerequisiti:
-1. pip install ollama google-genai chromadb python-dotenv requests
+1. pip install ollama google-genai chromadb numpy python-dotenv requests
 2. Installare Ollama: https://ollama.ai/
 3. Scaricare Llama3: ollama pull llama3
 4. Configurare GOOGLE_API_KEY nel file .env
 5. Creare cartella ./knowledge_base con file di testo
 """
 
+import copy
+import os
+import threading
+from collections import OrderedDict
 from local_agent import LocalAgent
 from remote_agent import RemoteAgent
 from rag_system import RAGSystem
-from database_manager import DatabaseManager
+from database_manager import MAX_TENANT_VIEWS, DatabaseManager
+from knowledge_watcher import KnowledgeWatcher
+from outbox import OutboxWorker
+from pomodoro_scheduler import PomodoroScheduler
+from habit_analytics import HabitAnalytics
+from task_analytics import TaskAnalytics
+
+# Premessa alle risposte dell'agente locale usato al posto di quello remoto
+REMOTE_FALLBACK_NOTICE = "⚠️ Agente remoto non disponibile, risponde l'agente locale."
 
 class TimeMindAgent:
-    def __init__(self):
+    def __init__(self, local_agent=None, remote_agent=None, db_path="./timemind.db"):
         print("🧠 Inizializzazione TimeMind Hybrid Agent...")
         
-        # Inizializza componenti
-        self.local_agent = LocalAgent()
-        self.remote_agent = RemoteAgent()
-        self.rag_system = RAGSystem()
-        self.db_manager = DatabaseManager()
+        # Inizializza componenti (agenti sostituibili, es. fake_agents per i test)
+        self.local_agent = local_agent or LocalAgent()
+        self.remote_agent = remote_agent or RemoteAgent()
+        # Vettori e outbox accanto al database, non nella directory corrente
+        data_dir = os.path.dirname(os.path.abspath(db_path))
+        self.rag_system = RAGSystem(remote_agent=self.remote_agent, data_dir=data_dir)
+        self.db_manager = DatabaseManager(db_path)
+        self.habit_analytics = HabitAnalytics(self.db_manager)
+        self.task_analytics = TaskAnalytics(self.db_manager)
+        
+        # Modalità multi-utente: l'agente principale è l'utente di default,
+        # gli altri utenti si ottengono con for_user()
+        self.user_id = self.db_manager.user_id
+        self._tenants = OrderedDict()
+        self._tenants_lock = threading.Lock()
+        
+        # Timer Pomodoro in background
+        self.pomodoro_scheduler = PomodoroScheduler(self.db_manager)
+        print(self.pomodoro_scheduler.start())
+        
+        # Aggiornamento live della knowledge base
+        self.knowledge_watcher = KnowledgeWatcher(self.rag_system)
+        print(self.knowledge_watcher.start())
+        
+        # Indicizzazione in background dei documenti rimasti in coda
+        self.outbox_worker = OutboxWorker(self.rag_system)
+        print(self.outbox_worker.start())
         
         # Test connessioni
         self.test_all_connections()
@@ -40,18 +74,72 @@ class TimeMindAgent:
         self.local_agent.test_connection()
         self.remote_agent.test_connection()
         print(self.rag_system.get_collection_stats())
+    
+    def for_user(self, user_id: str):
+        """Agente per un utente: modelli, RAG e scheduler condivisi, dati separati"""
+        with self._tenants_lock:
+            agent = self._tenants.get(user_id)
+            if agent is not None:
+                self._tenants.move_to_end(user_id)
+                return agent
+            
+            agent = copy.copy(self)
+            agent.user_id = user_id
+            agent.db_manager = self.db_manager.for_user(user_id)
+            agent.habit_analytics = HabitAnalytics(agent.db_manager)
+            agent.task_analytics = TaskAnalytics(agent.db_manager)
+            self._tenants[user_id] = agent
+            
+            # Stesso limite delle viste del database: si scarta l'utente usato meno di recente
+            if len(self._tenants) > MAX_TENANT_VIEWS:
+                self._tenants.popitem(last=False)
+            return agent
+    
+    def shutdown(self):
+        """Arresta i servizi in background"""
+        self.knowledge_watcher.stop()
+        self.outbox_worker.stop()
+        self.pomodoro_scheduler.stop()
         
-    def chat(self, user_input: str, use_remote: bool = False):
-        """Interfaccia principale di chat"""
+    def _prepare_chat(self, user_input: str, use_remote: bool = False):
+        """Sceglie l'agente e costruisce il contesto per una domanda"""
         # Cerca nella knowledge base
-        knowledge_context = self.rag_system.get_context_for_query(user_input)
+        knowledge_context = self.rag_system.get_context_for_query(user_input, user_id=self.user_id)
         context = f"Knowledge base:\n{knowledge_context}\n\n" if knowledge_context else ""
         
         # Determina se usare agente locale o remoto
         if use_remote or "analisi" in user_input.lower() or "report" in user_input.lower():
-            return self.remote_agent.generate_response(user_input, context)
+            # Metriche pre-aggregate invece dei dati grezzi: prompt compatto
+            analytics_context = self.task_analytics.get_context()
+            if analytics_context:
+                context += f"{analytics_context}\n\n"
+            return self.remote_agent, context
         else:
-            return self.local_agent.generate_response(user_input, context)
+            return self.local_agent, context
+    
+    def chat(self, user_input: str, use_remote: bool = False):
+        """Interfaccia principale di chat"""
+        agent, context = self._prepare_chat(user_input, use_remote)
+        response = agent.generate_response(user_input, context)
+        if response is None:
+            # Agente remoto non raggiungibile: ripiega sull'agente locale
+            return f"{REMOTE_FALLBACK_NOTICE}\n{self.local_agent.generate_response(user_input, context)}"
+        return response
+    
+    def chat_stream(self, user_input: str, use_remote: bool = False):
+        """Come chat, ma restituisce la risposta a frammenti"""
+        agent, context = self._prepare_chat(user_input, use_remote)
+        return self._stream_response(agent, user_input, context)
+    
+    def _stream_response(self, agent, user_input, context):
+        """Frammenti della risposta, con l'agente locale se il remoto non risponde"""
+        received = False
+        for chunk in agent.generate_response_stream(user_input, context):
+            received = True
+            yield chunk
+        if not received and agent is not self.local_agent:
+            yield f"{REMOTE_FALLBACK_NOTICE}\n"
+            yield from self.local_agent.generate_response_stream(user_input, context)
     
     # Metodi delegati al database manager
     def add_task(self, title: str, description: str = "", priority: int = 2, estimated_minutes: int = 30) -> str:
@@ -60,6 +148,9 @@ class TimeMindAgent:
     def get_tasks(self, status: str = "pending") -> str:
         return self.db_manager.get_tasks(status)
     
+    def list_tasks(self, status: str = "pending") -> list:
+        return self.db_manager.list_tasks(status)
+    
     def complete_task(self, task_id: int, actual_minutes: int = None) -> str:
         return self.db_manager.complete_task(task_id, actual_minutes)
     
@@ -72,24 +163,49 @@ class TimeMindAgent:
     def get_habits(self, active_only: bool = True) -> str:
         return self.db_manager.get_habits(active_only)
     
+    def list_habits(self, active_only: bool = True) -> list:
+        return self.db_manager.list_habits(active_only)
+    
     def log_habit(self, habit_id: int, completed: bool = True, notes: str = "") -> str:
         return self.db_manager.log_habit(habit_id, completed, notes)
     
-    def start_pomodoro(self, task_id: int = None) -> str:
-        return self.db_manager.start_pomodoro(task_id)
+    def get_habit_stats(self) -> str:
+        return self.habit_analytics.get_habit_stats()
+    
+    def get_habit_heatmap(self, weeks: int = 12) -> str:
+        return self.habit_analytics.get_heatmap(weeks)
+    
+    def start_pomodoro(self, task_id: int = None, cycles: int = 1) -> str:
+        return self.pomodoro_scheduler.start_pomodoro(task_id, cycles, self.user_id)
     
     def complete_pomodoro(self, session_id: int, notes: str = "") -> str:
         return self.db_manager.complete_pomodoro(session_id, notes)
     
+    def stop_pomodoro(self, timer_id: int) -> str:
+        return self.pomodoro_scheduler.cancel(timer_id, self.user_id)
+    
+    def get_pomodoro_status(self) -> str:
+        return self.pomodoro_scheduler.status(self.user_id)
+    
+    def get_pomodoro_stats(self) -> str:
+        return self.db_manager.get_pomodoro_stats()
+    
     def get_daily_summary(self) -> str:
         return self.db_manager.get_daily_summary()
     
+    def get_report(self, days: int = 30) -> str:
+        return self.task_analytics.get_report(days)
+    
+    def get_outbox_status(self) -> str:
+        return self.outbox_worker.status()
+    
     # Metodi RAG
     def add_knowledge(self, text: str, doc_id: str) -> str:
-        return self.rag_system.add_document(text, doc_id)
+        return self.rag_system.add_document(text, doc_id, user_id=self.user_id)
     
-    def search_knowledge(self, query: str) -> str:
-        results = self.rag_system.search_documents(query)
+    def search_knowledge(self, query: str, where: dict = None, date_from: str = None, date_to: str = None) -> str:
+        results = self.rag_system.search_documents(query, where=where, user_id=self.user_id,
+                                                   date_from=date_from, date_to=date_to)
         if results and results['documents']:
             return "\n".join(results['documents'])
         return "Nessun risultato trovato nella knowledge base"
@@ -110,16 +226,26 @@ def print_help():
     print("  • 'habits' - Mostra abitudini attive")
     print("  • 'log habit: ID' - Registra completamento abitudine")
     print("  • 'log habit: ID false' - Registra mancato completamento")
+    print("  • 'habit stats' - Streak e percentuali di completamento (7/30/90 giorni)")
+    print("  • 'habit heatmap' - Heatmap settimanale delle abitudini")
     print("\n🍅 POMODORO:")
-    print("  • 'pomodoro' - Avvia sessione Pomodoro")
-    print("  • 'pomodoro: task_id' - Avvia Pomodoro per task specifico")
-    print("  • 'complete pomodoro: session_id' - Completa sessione")
+    print("  • 'pomodoro' - Avvia sessione Pomodoro (completamento automatico)")
+    print("  • 'pomodoro: task_id [cicli]' - Avvia Pomodoro per task specifico")
+    print("  • 'pomodoro status' - Timer attivi e tempo rimanente")
+    print("  • 'pomodoro stats' - Sessioni e minuti di focus di oggi")
+    print("  • 'stop pomodoro: timer_id' - Interrompe un timer")
+    print("  • 'complete pomodoro: session_id' - Completa sessione manualmente")
     print("\n📊 ANALYTICS:")
     print("  • 'summary' - Riepilogo giornaliero")
+    print("  • 'report' - Accuratezza stime, tempi di ciclo, throughput e Pomodoro per task")
     print("  • 'stats' - Statistiche knowledge base")
+    print("  • 'watch status' - Stato aggiornamento live della knowledge base")
+    print("  • 'outbox status' - Documenti in coda per l'indicizzazione e stato del servizio remoto")
     print("\n🧠 CHAT & KNOWLEDGE:")
     print("  • 'remote: domanda' - Usa agente remoto (Gemini)")
     print("  • 'search: query' - Cerca nella knowledge base")
+    print("  • 'search: query | topic=deep_work' - Cerca con filtri (source, topic, language, date)")
+    print("  • 'search: query | date_from=2024-01-01, date_to=2024-03-31' - Cerca in un intervallo di date")
     print("  • 'add knowledge: doc_id | testo' - Aggiungi alla knowledge base")
     print("\n🔧 SISTEMA:")
     print("  • 'help' - Mostra questo aiuto")
@@ -182,6 +308,14 @@ def parse_command(user_input: str, agent: TimeMindAgent):
         print(f"🤖 {agent.get_habits()}")
         return "continue"
     
+    elif user_input.lower() == 'habit stats':
+        print(f"🤖 {agent.get_habit_stats()}")
+        return "continue"
+    
+    elif user_input.lower() == 'habit heatmap':
+        print(f"🤖 {agent.get_habit_heatmap()}")
+        return "continue"
+    
     elif user_input.startswith('log habit:'):
         parts = user_input.replace('log habit:', '').strip().split()
         try:
@@ -197,12 +331,30 @@ def parse_command(user_input: str, agent: TimeMindAgent):
         print(f"🤖 {agent.start_pomodoro()}")
         return "continue"
     
+    elif user_input.lower() == 'pomodoro status':
+        print(f"🤖 {agent.get_pomodoro_status()}")
+        return "continue"
+    
+    elif user_input.lower() == 'pomodoro stats':
+        print(f"🤖 {agent.get_pomodoro_stats()}")
+        return "continue"
+    
     elif user_input.startswith('pomodoro:'):
+        parts = user_input.replace('pomodoro:', '').strip().split()
+        try:
+            task_id = int(parts[0])
+            cycles = int(parts[1]) if len(parts) > 1 else 1
+            print(f"🤖 {agent.start_pomodoro(task_id, cycles)}")
+        except (ValueError, IndexError):
+            print("❌ Formato non valido. Usa: pomodoro: task_id [cicli]")
+        return "continue"
+    
+    elif user_input.startswith('stop pomodoro:'):
         try:
-            task_id = int(user_input.replace('pomodoro:', '').strip())
-            print(f"🤖 {agent.start_pomodoro(task_id)}")
+            timer_id = int(user_input.replace('stop pomodoro:', '').strip())
+            print(f"🤖 {agent.stop_pomodoro(timer_id)}")
         except ValueError:
-            print("❌ ID task non valido")
+            print("❌ ID timer non valido")
         return "continue"
     
     elif user_input.startswith('complete pomodoro:'):
@@ -218,15 +370,38 @@ def parse_command(user_input: str, agent: TimeMindAgent):
         print(f"🤖 {agent.get_daily_summary()}")
         return "continue"
     
+    elif user_input.lower() == 'report':
+        print(f"🤖 {agent.get_report()}")
+        return "continue"
+    
     elif user_input.lower() == 'stats':
         print(f"🤖 {agent.rag_system.get_collection_stats()}")
         return "continue"
     
+    elif user_input.lower() == 'watch status':
+        print(f"🤖 {agent.knowledge_watcher.status()}")
+        return "continue"
+    
+    elif user_input.lower() == 'outbox status':
+        print(f"🤖 {agent.get_outbox_status()}")
+        return "continue"
+    
     # === KNOWLEDGE COMMANDS ===
     elif user_input.startswith('search:'):
-        query = user_input.replace('search:', '').strip()
-        results = agent.search_knowledge(query)
-        print(f"🤖 Risultati ricerca:\n{results}")
+        content = user_input.replace('search:', '').strip()
+        query, _, filters = content.partition('|')
+        where = {}
+        for item in filters.split(','):
+            if '=' in item:
+                key, value = item.split('=', 1)
+                where[key.strip()] = value.strip()
+        date_from = where.pop('date_from', None)
+        date_to = where.pop('date_to', None)
+        try:
+            results = agent.search_knowledge(query.strip(), where or None, date_from, date_to)
+            print(f"🤖 Risultati ricerca:\n{results}")
+        except ValueError as e:
+            print(f"❌ {e}")
         return "continue"
     
     elif user_input.startswith('add knowledge:'):
@@ -269,10 +444,12 @@ def main():
                 result = parse_command(user_input, agent)
                 
                 if result == "quit":
+                    agent.shutdown()
                     print("👋 Arrivederci! Buona produttività!")
                     break
                     
             except KeyboardInterrupt:
+                agent.shutdown()
                 print("\n👋 Arrivederci!")
                 break
             except Exception as e:
@@ -0,0 +1,715 @@
+# -*- coding: utf-8 -*-
+"""
+Vector Store - Backend vettoriali intercambiabili per il RAG System
+
+- ChromaVectorStore: ChromaDB persistente con indice HNSW
+- NumpyVectorStore: matrice float32 memory-mapped con ricerca esatta,
+  opzionalmente preceduta da una scansione su codici int8 / binari
+"""
+
+import os
+import json
+import numpy as np
+
+# Modalità di quantizzazione supportate da NumpyVectorStore
+QUANTIZATION_MODES = ("int8", "binary")
+
+# Righe elaborate per blocco nella scansione dei codici quantizzati
+SCAN_BLOCK_ROWS = 16384
+
+# Numero di bit a 1 per ogni valore di un byte (distanza di Hamming)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+class VectorStore:
+    """Interfaccia comune dei backend usati da RAGSystem"""
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        """Inserisce o aggiorna documenti con i relativi embedding"""
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n_results=2, where=None):
+        """Restituisce ids, documents, distances e metadatas (una lista per query)"""
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, include_documents=False, include_embeddings=False):
+        """Restituisce ids e metadatas dei documenti selezionati (tutti se non filtrati)
+        
+        include_documents: aggiunge anche i testi ('documents')
+        include_embeddings: aggiunge anche i vettori ('embeddings')
+        """
+        raise NotImplementedError
+
+    def delete(self, ids):
+        """Elimina documenti per id"""
+        raise NotImplementedError
+
+    def count(self):
+        """Numero di documenti indicizzati"""
+        raise NotImplementedError
+
+    def dimensions(self):
+        """Dimensione dei vettori salvati (None se lo store è vuoto)"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Svuota completamente lo store"""
+        raise NotImplementedError
+
+    def describe(self):
+        """Descrizione breve della configurazione del backend"""
+        raise NotImplementedError
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, persist_directory="./timemind_chroma", hnsw_config=None, collection_name="knowledge_base"):
+        import chromadb
+
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.hnsw_config = hnsw_config or {}
+        self.chroma_client = chromadb.PersistentClient(path=persist_directory)
+        self.collection = self._get_collection()
+
+    def _get_collection(self):
+        """Apre (o crea) la collection con la configurazione HNSW
+
+        Su una collection esistente si applica solo search_ef (modificabile in
+        qualsiasi momento); per space, M e construction_ef serve un reset.
+        """
+        collection = self.chroma_client.get_or_create_collection(
+            self.collection_name,
+            metadata=self.hnsw_config or None
+        )
+
+        current = dict(collection.metadata or {})
+        search_ef = self.hnsw_config.get("hnsw:search_ef")
+        if search_ef is not None and current.get("hnsw:search_ef") != search_ef:
+            current["hnsw:search_ef"] = search_ef
+            collection.modify(metadata=current)
+
+        fixed = [key for key in ("hnsw:space", "hnsw:M", "hnsw:construction_ef")
+                 if key in self.hnsw_config and key in current and current[key] != self.hnsw_config[key]]
+        if fixed:
+            print(f"⚠️ Parametri HNSW della collection invariati ({', '.join(fixed)}): "
+                  f"usa reset_knowledge_base() per applicarli")
+        return collection
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            embeddings=embeddings,
+            documents=documents,
+            ids=ids,
+            metadatas=metadatas
+        )
+
+    def query(self, query_embeddings, n_results=2, where=None):
+        results = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=['documents', 'distances', 'metadatas']
+        )
+        return {
+            'ids': results['ids'],
+            'documents': results['documents'],
+            'distances': results['distances'] or [[] for _ in results['ids']],
+            'metadatas': results['metadatas'] or [[] for _ in results['ids']]
+        }
+
+    def get(self, ids=None, where=None, include_documents=False, include_embeddings=False):
+        include = ['metadatas']
+        if include_documents:
+            include.append('documents')
+        if include_embeddings:
+            include.append('embeddings')
+        results = self.collection.get(ids=ids, where=where, include=include)
+        selected = {'ids': results['ids'], 'metadatas': results['metadatas'] or []}
+        if include_documents:
+            selected['documents'] = results['documents'] or []
+        if include_embeddings:
+            embeddings = results['embeddings']
+            selected['embeddings'] = [] if embeddings is None else list(embeddings)
+        return selected
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+    def dimensions(self):
+        results = self.collection.get(limit=1, include=['embeddings'])
+        embeddings = results['embeddings']
+        if embeddings is None or len(embeddings) == 0:
+            return None
+        return len(embeddings[0])
+
+    def reset(self):
+        self.chroma_client.delete_collection(self.collection_name)
+        self.collection = self._get_collection()
+
+    def describe(self):
+        config = self.collection.metadata or {}
+        return (f"chroma, space={config.get('hnsw:space', 'l2')}, M={config.get('hnsw:M', 16)}, "
+                f"ef_construction={config.get('hnsw:construction_ef', 100)}, "
+                f"ef_search={config.get('hnsw:search_ef', 10)}")
+
+class NumpyVectorStore(VectorStore):
+    """Store in-memory con ricerca esatta (similarità coseno)
+
+    Su disco:
+    - vectors.f32: matrice float32 contigua di vettori normalizzati, solo append
+    - records.jsonl: log append-only di inserimenti ed eliminazioni
+
+    - codes.<modalità> / scales.f32: codici compatti se la quantizzazione è attiva
+
+    Gli aggiornamenti aggiungono una nuova riga e marcano la precedente come
+    eliminata; compact() riscrive i file senza le righe eliminate, in file
+    temporanei sostituiti solo a scrittura completata.
+
+    Con quantization="int8" o "binary" la ricerca avviene in due fasi: prima
+    si scansionano i codici compatti, poi i migliori k * rerank_factor
+    candidati vengono riordinati con i vettori float32 letti dal memory map.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    RECORDS_FILE = "records.jsonl"
+    SCALES_FILE = "scales.f32"
+
+    def __init__(self, persist_directory="./timemind_vectors", quantization=None, rerank_factor=10):
+        if quantization not in (None,) + QUANTIZATION_MODES:
+            raise ValueError(f"Quantizzazione non supportata: {quantization}")
+
+        self.persist_directory = persist_directory
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        os.makedirs(persist_directory, exist_ok=True)
+        self.vectors_path = os.path.join(persist_directory, self.VECTORS_FILE)
+        self.records_path = os.path.join(persist_directory, self.RECORDS_FILE)
+        self.scales_path = os.path.join(persist_directory, self.SCALES_FILE)
+        self.codes_path = os.path.join(persist_directory, f"codes.{quantization}") if quantization else None
+        self._load()
+
+    def _clear_state(self):
+        self.dim = None
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        self._codes_buffer = None
+        self._scales_buffer = None
+        self._alive_buffer = None
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_of = {}
+        self._columns = {}
+
+    def _load(self):
+        """Ricostruisce lo stato rileggendo il log dei record"""
+        self._clear_state()
+        self._recover_compaction()
+
+        if not os.path.exists(self.records_path):
+            return
+
+        alive = []
+        with open(self.records_path, 'r+b') as f:
+            offset = 0
+            for line in f:
+                start, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # Ultimo record scritto a metà (arresto durante una scrittura): viene scartato
+                    if f.read(1):
+                        raise
+                    f.truncate(start)
+                    break
+
+                if 'delete' in record:
+                    row = self._row_of.pop(record['delete'], None)
+                    if row is not None:
+                        alive[row] = False
+                    continue
+
+                if self.dim is None:
+                    self.dim = record['dim']
+                previous = self._row_of.get(record['id'])
+                if previous is not None:
+                    alive[previous] = False
+                self._row_of[record['id']] = len(self._ids)
+                self._ids.append(record['id'])
+                self._documents.append(record['document'])
+                self._metadatas.append(record['metadata'])
+                alive.append(True)
+
+        self._alive_buffer, self._alive = _append_rows(None, 0, np.array(alive, dtype=bool))
+
+        # Scarta eventuali byte di una scrittura interrotta
+        expected = len(self._ids) * (self.dim or 0) * 4
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > expected:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(expected)
+        self._remap()
+        self._load_codes()
+
+        # Compatta quando le righe eliminate superano quelle attive
+        if len(self._ids) - self.count() > max(self.count(), 100):
+            self.compact()
+
+    def _remap(self):
+        """Mappa in memoria il file dei vettori"""
+        rows = len(self._ids)
+        if rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+
+    def _code_files(self):
+        """File dei codici per tutte le modalità (attiva e non)"""
+        paths = [os.path.join(self.persist_directory, f"codes.{mode}") for mode in QUANTIZATION_MODES]
+        return paths + [self.scales_path]
+
+    def _load_codes(self):
+        """Carica i codici compatti, ricostruendoli se mancano o non sono allineati"""
+        for path in self._code_files():
+            if path not in (self.codes_path, self.scales_path) and os.path.exists(path):
+                os.remove(path)
+
+        if not self.quantization:
+            if os.path.exists(self.scales_path):
+                os.remove(self.scales_path)
+            return
+
+        rows = len(self._ids)
+        if rows == 0:
+            return
+        code_bytes = self._code_width() * rows
+        valid = (
+            os.path.exists(self.codes_path)
+            and os.path.getsize(self.codes_path) == code_bytes
+            and (self.quantization != "int8" or (
+                os.path.exists(self.scales_path) and os.path.getsize(self.scales_path) == rows * 4))
+        )
+
+        if not valid:
+            for path in (self.codes_path, self.scales_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            for start in range(0, rows, SCAN_BLOCK_ROWS):
+                self._append_codes(np.asarray(self._matrix[start:start + SCAN_BLOCK_ROWS]))
+
+        self._read_codes()
+
+    def _code_width(self):
+        """Byte occupati dal codice di una riga"""
+        if self.quantization == "binary":
+            return (self.dim + 7) // 8
+        return self.dim or 0
+
+    def _append_codes(self, vectors):
+        """Quantizza vettori normalizzati, li accoda ai file e restituisce (codici, scale)"""
+        scales = None
+        if self.quantization == "binary":
+            codes = np.packbits(vectors > 0, axis=1)
+        else:
+            # Scala simmetrica per riga: il massimo in valore assoluto va a 127
+            scales = np.abs(vectors).max(axis=1)
+            scales[scales == 0] = 1.0
+            codes = np.round(vectors / scales[:, None] * 127).astype(np.int8)
+            scales = (scales / 127).astype(np.float32)
+            with open(self.scales_path, 'ab') as f:
+                f.write(scales.tobytes())
+        with open(self.codes_path, 'ab') as f:
+            f.write(np.ascontiguousarray(codes).tobytes())
+        return codes, scales
+
+    def _read_codes(self):
+        """Legge in memoria i codici compatti (scansionati a ogni query)"""
+        self._codes = self._scales = self._codes_buffer = self._scales_buffer = None
+        if not self.quantization or not self._ids:
+            return
+        dtype = np.uint8 if self.quantization == "binary" else np.int8
+        self._codes = np.fromfile(self.codes_path, dtype=dtype).reshape(len(self._ids), self._code_width())
+        self._codes_buffer = self._codes
+        if self.quantization == "int8":
+            self._scales = self._scales_buffer = np.fromfile(self.scales_path, dtype=np.float32)
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = self._normalize(embeddings)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Dimensione embedding {vectors.shape[1]} diversa da {self.dim}")
+
+        # I vettori vanno su disco prima dei record: un record implica sempre la sua riga
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors).tobytes())
+
+        # Codici e righe attive sono accodati in memoria, senza rileggere i file
+        start = len(self._ids)
+        if self.quantization:
+            codes, scales = self._append_codes(vectors)
+            self._codes_buffer, self._codes = _append_rows(self._codes_buffer, start, codes)
+            if scales is not None:
+                self._scales_buffer, self._scales = _append_rows(self._scales_buffer, start, scales)
+        self._alive_buffer, self._alive = _append_rows(self._alive_buffer, start, np.ones(len(ids), dtype=bool))
+        for field, column in self._columns.items():
+            column.append([metadata.get(field) for metadata in metadatas])
+        with open(self.records_path, 'a', encoding='utf-8') as f:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                previous = self._row_of.get(doc_id)
+                if previous is not None:
+                    self._alive[previous] = False
+                self._row_of[doc_id] = len(self._ids)
+                self._ids.append(doc_id)
+                self._documents.append(document)
+                self._metadatas.append(metadata)
+                f.write(json.dumps({
+                    'id': doc_id, 'dim': self.dim, 'document': document, 'metadata': metadata
+                }, ensure_ascii=False) + "\n")
+
+        self._remap()
+
+    def _filter_mask(self, where):
+        """Maschera booleana delle righe che soddisfano il filtro 'where'"""
+        mask = self._alive.copy()
+        if where:
+            mask &= self._where_mask(where)
+        return mask
+
+    def _column(self, field):
+        """Colonna di un campo dei metadata, costruita al primo filtro che lo usa"""
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = _MetadataColumn()
+            column.append([metadata.get(field) for metadata in self._metadatas])
+        return column
+
+    def _where_mask(self, where):
+        """Valuta un filtro in sintassi Chroma con confronti vettoriali sulle colonne"""
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._where_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self._ids), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._where_mask(sub)
+                mask &= any_mask
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, expected in condition.items():
+                    mask &= self._condition_mask(key, op, expected)
+        return mask
+
+    def _condition_mask(self, field, op, expected):
+        column = self._column(field)
+        if op in ("$eq", "$ne"):
+            mask = column.codes() == column.code(expected)
+            return mask if op == "$eq" else ~mask
+        if op in ("$in", "$nin"):
+            mask = np.isin(column.codes(), [column.code(value) for value in expected])
+            return mask if op == "$in" else ~mask
+        if op in ("$gt", "$gte", "$lt", "$lte") and _is_number(expected):
+            # I valori mancanti o non numerici sono NaN: ogni confronto è falso
+            numbers = column.numbers()
+            with np.errstate(invalid='ignore'):
+                if op == "$gt":
+                    return numbers > expected
+                if op == "$gte":
+                    return numbers >= expected
+                if op == "$lt":
+                    return numbers < expected
+                return numbers <= expected
+        # Confronti tra stringhe e operatori non previsti: valutazione riga per riga
+        condition = {field: {op: expected}}
+        return np.array([_matches(metadata, condition) for metadata in self._metadatas], dtype=bool)
+
+    def query(self, query_embeddings, n_results=2, where=None):
+        queries = self._normalize(query_embeddings)
+        empty = {'ids': [[] for _ in queries], 'documents': [[] for _ in queries],
+                 'distances': [[] for _ in queries], 'metadatas': [[] for _ in queries]}
+
+        if self._matrix is None:
+            return empty
+
+        mask = self._filter_mask(where)
+        candidates = int(mask.sum())
+        if candidates == 0:
+            return empty
+        k = min(n_results, candidates)
+
+        if self.quantization:
+            top = self._two_stage_search(queries, mask, k, candidates)
+        else:
+            # Un'unica moltiplicazione matrice per tutte le query
+            scores = queries @ self._matrix.T
+            scores[:, ~mask] = -np.inf
+            top = []
+            for i, rows in enumerate(np.argpartition(-scores, k - 1, axis=1)[:, :k]):
+                top.append((rows, scores[i, rows]))
+
+        results = {'ids': [], 'documents': [], 'distances': [], 'metadatas': []}
+        for rows, row_scores in top:
+            order = np.argsort(-row_scores)
+            rows, row_scores = rows[order], row_scores[order]
+            results['ids'].append([self._ids[row] for row in rows])
+            results['documents'].append([self._documents[row] for row in rows])
+            results['distances'].append([float(1.0 - score) for score in row_scores])
+            results['metadatas'].append([self._metadatas[row] for row in rows])
+        return results
+
+    def _approximate_scores(self, queries):
+        """Punteggi approssimati (più alto = più simile) calcolati sui codici"""
+        scores = np.empty((len(queries), len(self._ids)), dtype=np.float32)
+        if self.quantization == "binary":
+            query_bits = np.packbits(queries > 0, axis=1)
+        for start in range(0, len(self._ids), SCAN_BLOCK_ROWS):
+            block = self._codes[start:start + SCAN_BLOCK_ROWS]
+            end = start + len(block)
+            if self.quantization == "binary":
+                # Distanza di Hamming tramite tabella di popcount
+                hamming = _POPCOUNT[block[None, :, :] ^ query_bits[:, None, :]].sum(axis=2)
+                # Cast prima del segno: la somma è senza segno e -hamming andrebbe in overflow
+                scores[:, start:end] = -hamming.astype(np.float32)
+            else:
+                scores[:, start:end] = (queries @ block.T.astype(np.float32)) * self._scales[start:end]
+        return scores
+
+    def _two_stage_search(self, queries, mask, k, candidates):
+        """Scansione sui codici compatti e riordino dei candidati a piena precisione"""
+        scores = self._approximate_scores(queries)
+        scores[:, ~mask] = -np.inf
+        n_candidates = min(candidates, max(k * self.rerank_factor, k))
+        shortlist = np.argpartition(-scores, n_candidates - 1, axis=1)[:, :n_candidates]
+
+        top = []
+        for query, rows in zip(queries, shortlist):
+            # Righe ordinate per leggere il memory map in modo sequenziale
+            rows = np.sort(rows)
+            exact = np.asarray(self._matrix[rows]) @ query
+            best = np.argpartition(-exact, k - 1)[:k]
+            top.append((rows[best], exact[best]))
+        return top
+
+    def get(self, ids=None, where=None, include_documents=False, include_embeddings=False):
+        if ids is None:
+            rows = np.flatnonzero(self._filter_mask(where)).tolist()
+        else:
+            rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+            if where:
+                rows = [row for row in rows if _matches(self._metadatas[row], where)]
+        selected = {
+            'ids': [self._ids[row] for row in rows],
+            'metadatas': [self._metadatas[row] for row in rows]
+        }
+        if include_documents:
+            selected['documents'] = [self._documents[row] for row in rows]
+        if include_embeddings:
+            selected['embeddings'] = list(np.asarray(self._matrix[rows])) if rows else []
+        return selected
+
+    def delete(self, ids):
+        with open(self.records_path, 'a', encoding='utf-8') as f:
+            for doc_id in ids:
+                row = self._row_of.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    f.write(json.dumps({'delete': doc_id}, ensure_ascii=False) + "\n")
+
+    def count(self):
+        return len(self._row_of)
+
+    def dimensions(self):
+        return self.dim if self._row_of else None
+
+    def compact(self):
+        """Riscrive i file eliminando le righe non più attive
+
+        I nuovi file sono scritti accanto ai vecchi: vectors.f32.new, poi il
+        log in un file temporaneo rinominato records.jsonl.new quando è
+        completo. Da quel momento la compattazione è confermata e la
+        sostituzione dei file viene completata anche dopo un arresto
+        (_recover_compaction); prima, i file originali restano validi.
+        """
+        if self._matrix is None:
+            return
+
+        rows = np.flatnonzero(self._alive)
+        vectors_new = self.vectors_path + ".new"
+        records_new = self.records_path + ".new"
+        records_tmp = self.records_path + ".tmp"
+
+        with open(vectors_new, 'wb') as f:
+            for start in range(0, len(rows), SCAN_BLOCK_ROWS):
+                f.write(np.ascontiguousarray(self._matrix[rows[start:start + SCAN_BLOCK_ROWS]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({
+                    'id': self._ids[row], 'dim': self.dim,
+                    'document': self._documents[row], 'metadata': self._metadatas[row]
+                }, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(records_tmp, records_new)
+
+        self._matrix = None
+        self._load()
+
+    def _recover_compaction(self):
+        """Completa o annulla una compattazione interrotta"""
+        vectors_new = self.vectors_path + ".new"
+        records_new = self.records_path + ".new"
+        records_tmp = self.records_path + ".tmp"
+
+        if os.path.exists(records_new):
+            # Compattazione confermata: sostituisce i file (i codici vengono ricostruiti)
+            if os.path.exists(vectors_new):
+                os.replace(vectors_new, self.vectors_path)
+            for path in self._code_files():
+                if os.path.exists(path):
+                    os.remove(path)
+            os.replace(records_new, self.records_path)
+            return
+
+        # Interrotta durante la scrittura: i file originali sono intatti
+        for path in (vectors_new, records_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def reset(self):
+        self._matrix = None
+        leftovers = [self.vectors_path + ".new", self.records_path + ".new", self.records_path + ".tmp"]
+        for path in [self.vectors_path, self.records_path] + self._code_files() + leftovers:
+            if os.path.exists(path):
+                os.remove(path)
+        self._clear_state()
+
+    def describe(self):
+        dead = len(self._ids) - self.count()
+        quantization = self.quantization or "float32"
+        return f"numpy, dim={self.dim}, righe={len(self._ids)}, eliminate={dead}, codici={quantization}"
+
+def _append_rows(buffer, size, rows):
+    """Accoda righe dopo le prime 'size' di un buffer che cresce per raddoppio
+
+    Restituisce il buffer (nuovo se la capacità non bastava) e la vista sulle
+    righe occupate: un upsert non ricopia tutto l'array a ogni chiamata.
+    """
+    end = size + len(rows)
+    if buffer is None or end > len(buffer):
+        capacity = max(2 * (len(buffer) if buffer is not None else 0), end, 1024)
+        grown = np.empty((capacity,) + rows.shape[1:], dtype=rows.dtype)
+        if buffer is not None:
+            grown[:size] = buffer[:size]
+        buffer = grown
+    buffer[size:end] = rows
+    return buffer, buffer[:end]
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating))
+
+class _MetadataColumn:
+    """Valori di un campo dei metadata per riga, come codici categorici e come numeri
+
+    I codici rendono uguaglianze e $in dei confronti tra interi; i numeri
+    (NaN se mancanti) servono agli operatori di intervallo. Gli array crescono
+    per raddoppio, quindi gli upsert incrementali non li ricopiano ogni volta.
+    """
+
+    # Codici riservati: valore mancante, valore cercato assente dalla colonna
+    # e valore di riga non confrontabile (mai uguale a nulla)
+    MISSING = -1
+    UNKNOWN = -2
+    UNHASHABLE = -3
+
+    def __init__(self):
+        self._index = {}
+        self._codes = np.empty(1024, dtype=np.int32)
+        self._numbers = np.empty(1024, dtype=np.float64)
+        self._size = 0
+
+    def code(self, value):
+        """Codice di un valore (UNKNOWN se nessuna riga lo contiene)"""
+        if value is None:
+            return self.MISSING
+        try:
+            return self._index.get(value, self.UNKNOWN)
+        except TypeError:
+            return self.UNKNOWN
+
+    def append(self, values):
+        end = self._size + len(values)
+        if end > len(self._codes):
+            capacity = max(2 * len(self._codes), end)
+            self._codes = np.resize(self._codes, capacity)
+            self._numbers = np.resize(self._numbers, capacity)
+
+        for row, value in enumerate(values, start=self._size):
+            if value is None:
+                code = self.MISSING
+            else:
+                try:
+                    code = self._index.setdefault(value, len(self._index))
+                except TypeError:
+                    code = self.UNHASHABLE
+            self._codes[row] = code
+            self._numbers[row] = value if _is_number(value) else np.nan
+        self._size = end
+
+    def codes(self):
+        return self._codes[:self._size]
+
+    def numbers(self):
+        return self._numbers[:self._size]
+
+def _matches(metadata, where):
+    """Valuta un filtro in sintassi Chroma sui metadata di un documento"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+                if op in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if op == "$gt" and not value > expected:
+                        return False
+                    if op == "$gte" and not value >= expected:
+                        return False
+                    if op == "$lt" and not value < expected:
+                        return False
+                    if op == "$lte" and not value <= expected:
+                        return False
+    return True